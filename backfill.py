@@ -1,72 +1,17 @@
 # backfill.py
 
 from core.scraper import BSEScraper
+from core import logging_setup
+from init_historical_db import initialize_database
 import os
 import asyncio
 import logging
-from datetime import datetime
-from pathlib import Path
-import sys
-import traceback
-
-
-
-def handle_exception(exc_type, exc_value, exc_traceback):
-    """Logs unhandled exceptions to the root logger."""
-    logger = logging.getLogger()
-    if logger.handlers:
-        
-        tb_lines = traceback.format_exception(exc_type, exc_value, exc_traceback)
-        tb_text = "".join(tb_lines)
-        logger.critical(f"Unhandled exception:\n{tb_text}")
-    
-    sys.__excepthook__(exc_type, exc_value, exc_traceback)
-
-
-def setup_logging():
-    """Configures the root logger for the application run."""
-    run_timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    # Create a specific log directory for this backfill run
-    log_dir = Path("logs") / f"BACKFILL-{run_timestamp}"
-    log_dir.mkdir(parents=True, exist_ok=True)
-
-    
-    logger = logging.getLogger()
-    logger.setLevel(logging.INFO)
-
-    
-    if logger.hasHandlers():
-        logger.handlers.clear()
-
-    
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-
-    
-    stream_handler = logging.StreamHandler()
-    stream_handler.setFormatter(formatter)
-    logger.addHandler(stream_handler)
-
-    
-    file_handler = logging.FileHandler(log_dir / "run.log")
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-
-
-    logging.getLogger("google.api_core").setLevel(logging.WARNING)
-    logging.getLogger("google.auth.transport.requests").setLevel(logging.WARNING)
-    logging.getLogger("urllib3.connectionpool").setLevel(logging.WARNING)
-    logging.getLogger("google_genai.types").setLevel(logging.ERROR)
-
-    return log_dir
 
 
 async def main():
     """Main async function to run the backfill process."""
-    log_path = setup_logging()
-    
-    sys.excepthook = handle_exception
+    log_path = logging_setup.configure("BACKFILL")
+    logging_setup.install_excepthook()
 
     logger = logging.getLogger(__name__)
 
@@ -84,6 +29,8 @@ async def main():
     )
     logger.info(f"📝 Full logs for this run are in: {log_path}")
 
+    # The historical schema is settled before the scraper's handlers use it.
+    initialize_database()
     scraper = BSEScraper(test_mode=False)
 
     
@@ -91,7 +38,7 @@ async def main():
 
     
     if notification_tasks:
-        await scraper.run_all_notifications_sequentially(notification_tasks)
+        await scraper.run_all_notifications_concurrently(notification_tasks)
 
     scraper.db.close()
     logger.info("✅ --- Backfill run complete. --- ✅")
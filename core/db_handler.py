@@ -1,86 +1,354 @@
 # core/db_handler.py
+import asyncio
 import sqlite3
 from pathlib import Path
-import json
+import orjson
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional
 
 DB_FILE = "database.db"
 
+# Applied to every connection. WAL lets readers run alongside the writer and,
+# together with synchronous=NORMAL, removes the journal fsync from each commit.
+SQLITE_PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-65536;
+PRAGMA mmap_size=268435456;
+"""
+
+# The connection lives for the whole process, so its prepared-statement cache
+# is kept large enough for every query shape it runs (the IN (...) lookups
+# vary in length), and the WAL is checkpointed less often than the default
+# 1000 pages so busy polls don't stall on checkpoints.
+CACHED_STATEMENTS = 512
+WAL_AUTOCHECKPOINT_PAGES = 10000
+
+# For throwaway test runs only: commits are no longer fsynced, so a crash or
+# power loss can lose or corrupt the latest writes. WAL mode is kept.
+RELAXED_DURABILITY_PRAGMAS = "PRAGMA synchronous=OFF; PRAGMA temp_store=MEMORY;"
+
+# The writer thread commits queued writes in batches of up to this many
+# messages, waiting at most this long for a batch to fill.
+WRITER_BATCH_SIZE = 500
+WRITER_BATCH_SECONDS = 0.05
+
+# NEWSIDs bound per IN (...) lookup, below SQLite's default parameter limit.
+STATUS_LOOKUP_CHUNK_SIZE = 900
+
+# Duplicate NEWSIDs are dropped by the insert itself, in the same B-tree
+# descent as the uniqueness check.
+INSERT_ANNOUNCEMENT_SQL = "INSERT INTO announcements (news_id, scrip_code, company_name, pdf_url, status) VALUES (?, ?, ?, ?, 'DOWNLOADED') ON CONFLICT (news_id) DO NOTHING"
+UPDATE_SUMMARY_SQL = (
+    "UPDATE announcements SET summary_json = ?, status = ? WHERE news_id = ?"
+)
+CACHE_PDF_RESULT_SQL = (
+    "INSERT OR REPLACE INTO pdf_cache (digest, result_json) VALUES (?, ?)"
+)
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
 
 class DBHandler:
+    """
+    Owns database.db. The SQLite connection lives on a dedicated writer thread:
+    writes are queued and return immediately (the thread commits them in
+    batches), while reads are coroutines queued behind them, so a read always
+    sees every write issued before it and the event loop never blocks on SQLite.
+    """
+
     def __init__(self, db_path=DB_FILE):
-        """Initializes the database connection and creates/updates the table."""
+        """
+        Initializes the database connection, creates/updates the table and
+        starts the writer thread, which owns the connection from then on.
+        """
         self.db_path = Path(db_path)
-        self.conn = sqlite3.connect(self.db_path)
+        self.conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            cached_statements=CACHED_STATEMENTS,
+        )
+        self.conn.executescript(SQLITE_PRAGMAS)
+        self.conn.execute(f"PRAGMA wal_autocheckpoint={WAL_AUTOCHECKPOINT_PAGES}")
         self.cursor = self.conn.cursor()
         self._create_table()
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(
+            target=self._writer_loop, name="db-writer", daemon=True
+        )
+        self._writer.start()
 
-    def _create_table(self):
+    def _writer_loop(self):
+        """Runs on the writer thread: the only code that touches the connection."""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + WRITER_BATCH_SECONDS
+            # Keep collecting while only writes are arriving; a read or the
+            # stop sentinel ends the batch so it is answered without delay.
+            while len(batch) < WRITER_BATCH_SIZE and batch[-1][0] == "write":
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            writes = []
+            for kind, payload, future in batch:
+                if kind == "write":
+                    writes.append(payload)
+                    continue
+                self._commit_writes(writes)
+                writes = []
+                if kind is _STOP:
+                    self._optimize()
+                    self.conn.close()
+                    return
+                try:
+                    future.set_result(payload(self.conn))
+                except Exception as e:
+                    future.set_exception(e)
+            self._commit_writes(writes)
+
+    def _commit_writes(self, writes: list):
         """
-        Creates the 'announcements' table or adds new columns if they don't exist.
-        Status can be: 'DOWNLOADED', 'PROCESSED', 'ERROR_PROCESSING'
+        Commits a list of (sql, rows) writes as one transaction. If that
+        fails, the writes are retried one transaction each, so a bad write
+        only loses itself and not the unrelated writes batched with it.
         """
-        self.cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS announcements (
-                news_id TEXT PRIMARY KEY,
-                scrip_code TEXT,
-                company_name TEXT,
-                download_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                status TEXT DEFAULT 'DOWNLOADED',
-                summary_json TEXT
+        if not writes:
+            return
+        # Merge consecutive writes of the same statement into one executemany.
+        merged = []
+        for sql, rows in writes:
+            if merged and merged[-1][0] == sql:
+                merged[-1][1].extend(rows)
+            else:
+                merged.append((sql, list(rows)))
+        try:
+            with self.conn:
+                for sql, rows in merged:
+                    self.cursor.executemany(sql, rows)
+            return
+        except sqlite3.Error as e:
+            if len(writes) == 1:
+                self._log_dropped_write(*writes[0], e)
+                return
+            logger.warning(
+                f"⚠️ Batch of {len(writes)} queued DB writes failed ({e}); retrying them one by one."
             )
-        """
-        )
+        for sql, rows in writes:
+            try:
+                with self.conn:
+                    self.cursor.executemany(sql, rows)
+            except sqlite3.Error as e:
+                self._log_dropped_write(sql, rows, e)
+
+    @staticmethod
+    def _log_dropped_write(sql: str, rows: list, error: sqlite3.Error):
+        """Logs a write that could not be committed, naming what it was for."""
+        if sql == UPDATE_SUMMARY_SQL:
+            keys = [f"news_id={row[2]}" for row in rows]
+        elif sql == CACHE_PDF_RESULT_SQL:
+            keys = [f"pdf digest={row[0]}" for row in rows]
+        else:
+            keys = [f"news_id={row[0]}" for row in rows]
+        logger.error(f"❌ Dropped DB write for {', '.join(keys)}: {error}")
 
+    def _optimize(self):
+        """
+        Lets SQLite refresh the planner statistics its queries ran short of,
+        as recommended before closing a connection. It returns immediately
+        when there is nothing to update.
+        """
         try:
+            self.conn.execute("PRAGMA optimize")
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ PRAGMA optimize failed on close: {e}")
+
+    def _write(self, sql: str, rows: list):
+        """Queues a write for the writer thread and returns immediately."""
+        self._queue.put(("write", (sql, rows), None))
+
+    async def _call(self, fn):
+        """Runs fn(conn) on the writer thread and awaits its result."""
+        future = Future()
+        self._queue.put(("call", fn, future))
+        return await asyncio.wrap_future(future)
+
+    def _create_table(self):
+        """
+        Creates the 'announcements' table or adds new columns if they don't exist.
+        Status can be: 'DOWNLOADED', 'PROCESSED', 'ERROR_PROCESSING'
+        The applied schema version is kept in PRAGMA user_version, so on an
+        up-to-date database this is a single pragma read.
+        """
+        version = self.cursor.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
             self.cursor.execute(
-                "ALTER TABLE announcements ADD COLUMN status TEXT DEFAULT 'DOWNLOADED'"
+                """
+                CREATE TABLE IF NOT EXISTS announcements (
+                    news_id TEXT PRIMARY KEY,
+                    scrip_code TEXT,
+                    company_name TEXT,
+                    download_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    status TEXT DEFAULT 'DOWNLOADED',
+                    summary_json BLOB
+                )
+            """
             )
-        except sqlite3.OperationalError:
-            pass
-        try:
+            # Databases created before these columns existed.
+            columns = {
+                row[1]
+                for row in self.cursor.execute("PRAGMA table_info(announcements)")
+            }
+            if "status" not in columns:
+                self.cursor.execute(
+                    "ALTER TABLE announcements ADD COLUMN status TEXT DEFAULT 'DOWNLOADED'"
+                )
+            if "summary_json" not in columns:
+                self.cursor.execute(
+                    "ALTER TABLE announcements ADD COLUMN summary_json BLOB"
+                )
+            # Processed PDF content keyed by file digest, so re-runs skip parsing.
             self.cursor.execute(
-                "ALTER TABLE announcements ADD COLUMN summary_json TEXT"
+                """
+                CREATE TABLE IF NOT EXISTS pdf_cache (
+                    digest TEXT PRIMARY KEY,
+                    result_json BLOB
+                )
+            """
             )
-        except sqlite3.OperationalError:
-            pass
+            self.cursor.execute("PRAGMA user_version = 1")
+        if version < 2:
+            # The PDF URL is kept so a re-summary needn't ask BSE for it again.
+            self.cursor.execute("ALTER TABLE announcements ADD COLUMN pdf_url TEXT")
+            self.cursor.execute("PRAGMA user_version = 2")
         self.conn.commit()
 
-    def is_processed(self, news_id: str) -> bool:
+    async def relax_durability(self):
+        """Applies RELAXED_DURABILITY_PRAGMAS on the writer's connection."""
+        await self._call(lambda conn: conn.executescript(RELAXED_DURABILITY_PRAGMAS))
+
+    async def is_processed(self, news_id: str) -> bool:
         """Checks if a given NEWSID has already been downloaded."""
-        self.cursor.execute("SELECT 1 FROM announcements WHERE news_id = ?", (news_id,))
-        return self.cursor.fetchone() is not None
+        return await self._call(
+            lambda conn: conn.execute(
+                "SELECT 1 FROM announcements WHERE news_id = ?", (news_id,)
+            ).fetchone()
+            is not None
+        )
 
-    def needs_summarization(self, news_id: str) -> bool:
+    async def needs_summarization(self, news_id: str) -> bool:
         """Checks if a downloaded item still needs to be summarized."""
-        self.cursor.execute(
-            "SELECT 1 FROM announcements WHERE news_id = ? AND status = 'DOWNLOADED'",
-            (news_id,),
+        return await self._call(
+            lambda conn: conn.execute(
+                "SELECT 1 FROM announcements WHERE news_id = ? AND status = 'DOWNLOADED'",
+                (news_id,),
+            ).fetchone()
+            is not None
+        )
+
+    async def get_statuses(self, news_ids: list[str]) -> dict[str, str]:
+        """
+        Returns {news_id: status} for the given NEWSIDs that are already in
+        the database, looked up by primary key in a few IN (...) queries so a
+        run can test every announcement in memory.
+        """
+        unique_ids = list(dict.fromkeys(news_ids))
+
+        def _load(conn):
+            statuses = {}
+            for start in range(0, len(unique_ids), STATUS_LOOKUP_CHUNK_SIZE):
+                chunk = unique_ids[start : start + STATUS_LOOKUP_CHUNK_SIZE]
+                placeholders = ", ".join("?" * len(chunk))
+                statuses.update(
+                    conn.execute(
+                        f"SELECT news_id, status FROM announcements WHERE news_id IN ({placeholders})",
+                        chunk,
+                    )
+                )
+            return statuses
+
+        return await self._call(_load)
+
+    async def get_pdf_url(self, news_id: str) -> Optional[str]:
+        """Returns the PDF URL stored for a NEWSID, if any."""
+        row = await self._call(
+            lambda conn: conn.execute(
+                "SELECT pdf_url FROM announcements WHERE news_id = ?", (news_id,)
+            ).fetchone()
         )
-        return self.cursor.fetchone() is not None
+        return row[0] if row else None
 
-    def add_new_announcement(self, news_id: str, scrip_code: str, company_name: str):
+    async def get_cached_pdf_result(self, digest: str) -> Optional[dict]:
+        """Returns the cached PDFProcessor result for a file digest, if any."""
+        row = await self._call(
+            lambda conn: conn.execute(
+                "SELECT result_json FROM pdf_cache WHERE digest = ?", (digest,)
+            ).fetchone()
+        )
+        return orjson.loads(row[0]) if row else None
+
+    def cache_pdf_result(self, digest: str, result: dict):
+        """Stores a PDFProcessor result under its file digest."""
+        self._write(CACHE_PDF_RESULT_SQL, [(digest, orjson.dumps(result))])
+
+    def add_new_announcement(
+        self,
+        news_id: str,
+        scrip_code: str,
+        company_name: str,
+        pdf_url: Optional[str] = None,
+    ):
         """Adds a new NEWSID to the database with 'DOWNLOADED' status."""
-        try:
-            self.cursor.execute(
-                "INSERT INTO announcements (news_id, scrip_code, company_name, status) VALUES (?, ?, ?, 'DOWNLOADED')",
-                (news_id, scrip_code, company_name),
-            )
-            self.conn.commit()
-        except sqlite3.IntegrityError:
-            pass
+        self.add_new_announcements_bulk([(news_id, scrip_code, company_name, pdf_url)])
+
+    def add_new_announcements_bulk(
+        self, rows: list[tuple[str, str, str, Optional[str]]]
+    ):
+        """
+        Adds many (news_id, scrip_code, company_name, pdf_url) rows with 'DOWNLOADED' status
+        in a single transaction, so a whole batch costs one commit. Rows that
+        already exist are silently ignored.
+        """
+        if not rows:
+            return
+        self._write(INSERT_ANNOUNCEMENT_SQL, rows)
 
     def update_summary(
         self, news_id: str, summary_data: dict, status: str = "PROCESSED"
     ):
         """Updates an announcement with the summary JSON and new status."""
-        summary_str = json.dumps(summary_data, indent=2)
-        self.cursor.execute(
-            "UPDATE announcements SET summary_json = ?, status = ? WHERE news_id = ?",
-            (summary_str, status, news_id),
+        self.update_summaries_bulk([(news_id, summary_data, status)])
+
+    def update_summaries_bulk(self, items: list[tuple[str, dict, str]]):
+        """
+        Applies many (news_id, summary_data, status) updates in one transaction.
+        summary_json is stored as the compact UTF-8 bytes orjson produces, bound
+        as a BLOB without an intermediate str; it is read back with orjson.loads.
+        """
+        if not items:
+            return
+        self._write(
+            UPDATE_SUMMARY_SQL,
+            [
+                (orjson.dumps(summary_data), status, news_id)
+                for news_id, summary_data, status in items
+            ],
         )
-        self.conn.commit()
 
     def close(self):
-        """Closes the database connection."""
-        self.conn.close()
+        """Flushes queued writes, closes the connection and stops the writer thread."""
+        if not self._writer.is_alive():
+            return
+        self._queue.put((_STOP, None, None))
+        self._writer.join()
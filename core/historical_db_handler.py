@@ -1,16 +1,80 @@
 # core/historical_db_handler.py
 
+import hashlib
 import sqlite3
 import logging
+import threading
 from pathlib import Path
-from typing import Optional, Dict, Any
-import json
+from typing import Optional, Dict, Any, List, Tuple
+import orjson
+
+from .db_handler import CACHED_STATEMENTS, RELAXED_DURABILITY_PRAGMAS, SQLITE_PRAGMAS
 
 HISTORICAL_DB_FILE = "historical_announcements.db"
 
+# (scrip_code, date) pairs bound per batched lookup; two parameters each keeps
+# a chunk well under SQLite's default host-parameter limit.
+LOOKUP_CHUNK_SIZE = 400
+
+# Covers the "latest announcement before a date" lookups: the newest entry for
+# a scrip is the first one in the index, and carrying news_id lets the batched
+# lookup rank candidates without touching the table. It replaces the older
+# (scrip_code, announcement_date) index of the same purpose.
+LATEST_ANNOUNCEMENT_INDEX_SQL = """
+DROP INDEX IF EXISTS idx_scrip_code_date;
+CREATE INDEX IF NOT EXISTS idx_scrip_code_date_news
+ON announcements (scrip_code, announcement_date DESC, news_id);
+"""
+
+# No conflict target: a row is skipped when either its news_id or its PDF
+# (by pdf_url_hash, both unique) is already stored.
+INSERT_ANNOUNCEMENT_SQL = """
+INSERT INTO announcements (news_id, scrip_code, company_name, announcement_date, pdf_url, pdf_url_hash)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT DO NOTHING
+"""
+
+# Summaries live in their own table (see init_historical_db.py); the
+# announcements_full view joins them back for the lookups.
+UPSERT_SUMMARY_SQL = """
+INSERT INTO announcement_summaries (news_id, summary_json) VALUES (?, ?)
+ON CONFLICT (news_id) DO UPDATE SET summary_json = excluded.summary_json
+"""
+
 logger = logging.getLogger(__name__)
 
 
+def pdf_url_hash(pdf_url: str) -> int:
+    """
+    The 64-bit key the historical table enforces PDF uniqueness on, so its
+    UNIQUE index holds 8-byte integers instead of full URLs.
+    """
+    digest = hashlib.blake2b(pdf_url.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def bulk_insert_announcements(
+    conn: sqlite3.Connection, rows: List[Tuple[str, str, str, str, str]]
+) -> int:
+    """
+    Inserts many (news_id, scrip_code, company_name, announcement_date, pdf_url)
+    rows in a single transaction, so the whole batch costs one commit. The
+    write lock is taken up front with BEGIN IMMEDIATE, so a concurrent writer
+    makes this wait for the busy timeout instead of failing midway. Rows that
+    already exist are ignored. Returns the number of rows inserted.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        cursor = conn.executemany(
+            INSERT_ANNOUNCEMENT_SQL, ((*row, pdf_url_hash(row[4])) for row in rows)
+        )
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+    return cursor.rowcount
+
+
 class HistoricalDBHandler:
     """
     A dedicated handler for interacting with the historical_announcements.db.
@@ -22,10 +86,39 @@ class HistoricalDBHandler:
         if not self.db_path.exists():
             logger.error(f"FATAL: Historical database not found at '{self.db_path}'!")
             raise FileNotFoundError(f"Historical database not found at {self.db_path}")
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn = sqlite3.connect(
+            self.db_path, check_same_thread=False, cached_statements=CACHED_STATEMENTS
+        )
+        self.conn.executescript(SQLITE_PRAGMAS)
         self.conn.row_factory = sqlite3.Row  # Makes fetching rows as dicts easy
+        # Lookups use per-thread read-only connections, so they never queue on
+        # this connection's mutex behind each other or behind JIT writes.
+        self._local = threading.local()
+        self._read_conns = []
+        self._read_conns_lock = threading.Lock()
         logger.info("🔗 Connected to historical database.")
 
+    def _get_read_conn(self) -> sqlite3.Connection:
+        """Returns this thread's read-only connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Not immutable=1: the same file receives JIT summaries while running.
+            conn = sqlite3.connect(
+                f"{self.db_path.resolve().as_uri()}?mode=ro",
+                uri=True,
+                check_same_thread=False,
+                # One statement per chunk length of the batched lookup.
+                cached_statements=CACHED_STATEMENTS,
+            )
+            conn.executescript(
+                "PRAGMA cache_size=-65536; PRAGMA mmap_size=268435456;"
+            )
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            with self._read_conns_lock:
+                self._read_conns.append(conn)
+        return conn
+
     def get_latest_announcement_for_scrip(
         self, scrip_code: str, current_ann_date: str
     ) -> Optional[Dict[str, Any]]:
@@ -41,11 +134,11 @@ class HistoricalDBHandler:
             A dictionary representing the database row, or None if not found.
         """
         try:
-            cursor = self.conn.cursor()
+            cursor = self._get_read_conn().cursor()
             cursor.execute(
                 """
                 SELECT news_id, scrip_code, company_name, announcement_date, pdf_url, summary_json
-                FROM announcements
+                FROM announcements_full
                 WHERE scrip_code = ? AND announcement_date < ?
                 ORDER BY announcement_date DESC
                 LIMIT 1
@@ -58,24 +151,104 @@ class HistoricalDBHandler:
             logger.error(f"Failed to query historical DB for {scrip_code}: {e}")
             return None
 
+    def get_latest_for_many(
+        self, pairs: List[Tuple[str, str]]
+    ) -> Optional[Dict[Tuple[str, str], Dict[str, Any]]]:
+        """
+        Batched form of get_latest_announcement_for_scrip: resolves every
+        (scrip_code, current_ann_date) pair with one windowed query per chunk
+        instead of one query per announcement.
+
+        Returns:
+            A dictionary mapping each pair to its previous announcement row.
+            Pairs with no earlier announcement are absent. Pairs that resolve
+            to the same announcement share one row dictionary. None if the
+            query failed.
+        """
+        unique_pairs = list(dict.fromkeys(pairs))
+        rows_by_news_id: Dict[str, Dict[str, Any]] = {}
+        results: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        try:
+            conn = self._get_read_conn()
+            for start in range(0, len(unique_pairs), LOOKUP_CHUNK_SIZE):
+                chunk = unique_pairs[start : start + LOOKUP_CHUNK_SIZE]
+                # A VALUES CTE rather than a temp table: it needs no writes, so
+                # it runs on the read-only connection.
+                values = ", ".join(["(?, ?)"] * len(chunk))
+                cursor = conn.execute(
+                    f"""
+                    WITH q(scrip, cur_date) AS (VALUES {values}),
+                    -- Ranked on the covering index alone; only the winning
+                    -- rows are then read from the table.
+                    ranked AS (
+                        SELECT q.scrip AS q_scrip, q.cur_date AS q_date, i.news_id,
+                               ROW_NUMBER() OVER (
+                                   PARTITION BY q.scrip, q.cur_date
+                                   ORDER BY i.announcement_date DESC
+                               ) AS rn
+                        FROM q
+                        JOIN announcements i
+                          ON i.scrip_code = q.scrip AND i.announcement_date < q.cur_date
+                    )
+                    SELECT r.q_scrip, r.q_date,
+                           a.news_id, a.scrip_code, a.company_name,
+                           a.announcement_date, a.pdf_url, a.summary_json
+                    FROM ranked r
+                    JOIN announcements_full a ON a.news_id = r.news_id
+                    WHERE r.rn = 1
+                    """,
+                    [value for pair in chunk for value in pair],
+                )
+                for row in cursor:
+                    record = rows_by_news_id.setdefault(
+                        row["news_id"],
+                        {
+                            key: row[key]
+                            for key in row.keys()
+                            if key not in ("q_scrip", "q_date")
+                        },
+                    )
+                    results[(row["q_scrip"], row["q_date"])] = record
+        except sqlite3.Error as e:
+            logger.error(
+                f"Failed to batch-query historical DB for {len(unique_pairs)} scrips: {e}"
+            )
+            return None
+        return results
+
+    def relax_durability(self) -> None:
+        """Applies RELAXED_DURABILITY_PRAGMAS to the connection that writes summaries."""
+        self.conn.executescript(RELAXED_DURABILITY_PRAGMAS)
+
     def update_summary(self, news_id: str, summary_data: dict) -> None:
         """
         Updates a historical record with its newly generated summary JSON.
         This is used by the Just-in-Time summarization process.
         """
-        summary_str = json.dumps(summary_data, indent=2)
+        # Bound as a BLOB of UTF-8 JSON; readers parse it with orjson.loads,
+        # which also accepts the TEXT values of older rows.
+        summary_blob = orjson.dumps(summary_data)
         try:
             with self.conn:  # Use context manager for automatic commit/rollback
                 self.conn.execute(
-                    "UPDATE announcements SET summary_json = ? WHERE news_id = ?",
-                    (summary_str, news_id),
+                    UPSERT_SUMMARY_SQL,
+                    (news_id, summary_blob),
                 )
             logger.info(f"💾 Updated historical summary for {news_id}.")
         except sqlite3.Error as e:
             logger.error(f"Failed to update historical summary for {news_id}: {e}")
 
     def close(self):
-        """Closes the database connection."""
+        """Closes the read connections and the main database connection."""
+        with self._read_conns_lock:
+            for conn in self._read_conns:
+                conn.close()
+            self._read_conns.clear()
         if self.conn:
+            # Keeps the planner's statistics for the lookup index current.
+            try:
+                self.conn.execute("PRAGMA optimize")
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ PRAGMA optimize failed on close: {e}")
             self.conn.close()
             logger.info("Historical database connection closed.")
@@ -0,0 +1,67 @@
+# core/log_handlers.py
+import logging
+import logging.handlers
+import queue
+import threading
+
+
+class BufferedFileHandler(logging.FileHandler):
+    """
+    A FileHandler that writes through a large userspace buffer and flushes it
+    from a background timer (and on close) instead of after every record.
+    """
+
+    def __init__(self, filename, buffer_size=1 << 16, flush_interval=1.0, **kwargs):
+        self.buffer_size = buffer_size
+        super().__init__(filename, **kwargs)
+        self._stop_flushing = threading.Event()
+        self._flusher = threading.Thread(
+            target=self._flush_periodically,
+            args=(flush_interval,),
+            name="log-flusher",
+            daemon=True,
+        )
+        self._flusher.start()
+
+    def _open(self):
+        return open(
+            self.baseFilename,
+            self.mode,
+            buffering=self.buffer_size,
+            encoding=self.encoding,
+            errors=self.errors,
+        )
+
+    def emit(self, record):
+        """Writes the record into the buffer without flushing it."""
+        if self.stream is None:
+            self.stream = self._open()
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+    def _flush_periodically(self, interval: float):
+        while not self._stop_flushing.wait(interval):
+            self.flush()
+
+    def close(self):
+        self._stop_flushing.set()
+        super().close()
+
+
+def start_queue_logging(
+    logger: logging.Logger, *handlers: logging.Handler
+) -> logging.handlers.QueueListener:
+    """
+    Attaches a QueueHandler to the logger and starts a QueueListener that hands
+    the queued records to the given handlers on its own thread. Logging calls
+    then only enqueue a record; the caller must stop() the returned listener.
+    """
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    listener.start()
+    return listener
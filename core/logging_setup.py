@@ -0,0 +1,68 @@
+# core/logging_setup.py
+import atexit
+import logging
+import sys
+import time
+import traceback
+from pathlib import Path
+
+from .log_handlers import BufferedFileHandler, start_queue_logging
+
+# Resolved once at import; each run gets its own directory under it.
+LOG_ROOT = Path("logs").resolve()
+
+
+def handle_exception(exc_type, exc_value, exc_traceback):
+    """Logs unhandled exceptions to the root logger."""
+    logger = logging.getLogger()
+    # The traceback is only formatted when a CRITICAL record would be emitted.
+    if logger.handlers and logger.isEnabledFor(logging.CRITICAL):
+        tb_lines = traceback.format_exception(exc_type, exc_value, exc_traceback)
+        tb_text = "".join(tb_lines)
+        logger.critical("Unhandled exception:\n%s", tb_text)
+
+    sys.__excepthook__(exc_type, exc_value, exc_traceback)
+
+
+def install_excepthook():
+    """Routes uncaught exceptions through the root logger."""
+    sys.excepthook = handle_exception
+
+
+def configure(run_kind: str) -> Path:
+    """
+    Configures the root logger for one application run and returns its log
+    directory, logs/<run_kind>-<timestamp>. Console and file output go through
+    a queue to a background listener, so logging never writes on the event
+    loop; the listener is stopped at exit (after the excepthook has logged any
+    crash) to drain the last records.
+    """
+    run_timestamp = time.strftime("%Y%m%d-%H%M%S", time.localtime())
+    log_dir = LOG_ROOT / f"{run_kind}-{run_timestamp}"
+    log_dir.mkdir(parents=True, exist_ok=True)
+
+    logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
+
+    if logger.hasHandlers():
+        logger.handlers.clear()
+
+    formatter = logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+
+    file_handler = BufferedFileHandler(log_dir / "run.log")
+    file_handler.setFormatter(formatter)
+    log_listener = start_queue_logging(logger, stream_handler, file_handler)
+    atexit.register(log_listener.stop)
+
+    # --- Control third-party library verbosity ---
+    logging.getLogger("google.api_core").setLevel(logging.WARNING)
+    logging.getLogger("google.auth.transport.requests").setLevel(logging.WARNING)
+    logging.getLogger("urllib3.connectionpool").setLevel(logging.WARNING)
+    logging.getLogger("google_genai.types").setLevel(logging.ERROR)
+
+    return log_dir
@@ -9,6 +9,8 @@ from typing import Dict, Any, Union
 import json
 import re
 
+from .rate_limiter import AsyncRateLimiter
+
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +29,11 @@ SENTIMENT_EMOJIS = {
 # The character limit for Telegram messages. Set slightly below the hard max for safety.
 MAX_TELEGRAM_LENGTH = 4000
 
+# Telegram's bot limits: about 30 messages per second overall and one
+# message per second to any single chat.
+GLOBAL_MESSAGES_PER_SECOND = 30
+CHAT_MESSAGES_PER_SECOND = 1
+
 
 class TelegramNotifier:
     def __init__(self):
@@ -36,6 +43,8 @@ class TelegramNotifier:
         self.is_enabled = bool(
             self.bot_token and self.chat_id_summaries and self.chat_id_links
         )
+        self._global_limiter = AsyncRateLimiter(GLOBAL_MESSAGES_PER_SECOND, 1.0)
+        self._chat_limiters: Dict[str, AsyncRateLimiter] = {}
         if self.is_enabled:
             logger.info("✅ Telegram Notifier initialized successfully.")
         else:
@@ -53,6 +62,16 @@ class TelegramNotifier:
             f"([{re.escape(escape_chars)}])", lambda m: f"\\{m.group(1)}", text
         )
 
+    async def _wait_for_send_slot(self, chat_id: str) -> None:
+        """Waits until both the per-chat and the global rate limit allow a send."""
+        chat_limiter = self._chat_limiters.get(chat_id)
+        if chat_limiter is None:
+            chat_limiter = self._chat_limiters[chat_id] = AsyncRateLimiter(
+                CHAT_MESSAGES_PER_SECOND, 1.0
+            )
+        await chat_limiter.acquire()
+        await self._global_limiter.acquire()
+
     async def _send_message(self, chat_id: str, message: str) -> bool:
         """Sends a message as plain text with a  retry mechanism."""
         if not self.is_enabled:
@@ -64,6 +83,7 @@ class TelegramNotifier:
         )
 
         for attempt in range(1, 4):
+            await self._wait_for_send_slot(chat_id)
             try:
                 await bot.send_message(
                     chat_id=chat_id,
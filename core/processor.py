@@ -1,11 +1,42 @@
 # core/processor.py
-from PyPDF2 import PdfReader
+import pypdfium2 as pdfium
 import re
+import hashlib
+import threading
 from pathlib import Path
 import logging
+from urllib.parse import urlparse
+
+try:
+    # google-re2 matches in linear time with a DFA and mirrors the `re` API,
+    # though not its Unicode \s (see URL_WHITESPACE).
+    import re2 as _url_regex
+except ImportError:
+    _url_regex = re
 
 logger = logging.getLogger()  
 
+# Anything smaller than this cannot be a usable PDF (e.g. an error page or a
+# truncated download), so it is rejected without parsing.
+MIN_PDF_BYTES = 1024
+
+# Links whose path ends in one of these are treated as media to summarize.
+MEDIA_EXTS = (".mp3", ".mp4", ".wav", ".m4a", ".pdf")
+
+# Every match of the URL pattern starts with one of these.
+URL_MARKERS = ("http", "www.", "file://")
+
+# The characters Python's `re` counts as \s in a str pattern. RE2's \s is only
+# [\t\n\f\r ], so a URL would run on past a non-breaking space (common in
+# PDFium text); listing them keeps both engines ending URLs at the same place.
+URL_WHITESPACE = (
+    "\t\n\v\f\r\x1c-\x1f \x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000"
+)
+
+# PDFs are fingerprinted through one preallocated buffer per thread.
+READ_BUFFER_SIZE = 1 << 20
+_read_buffers = threading.local()
+
 
 class PDFProcessor:
     """
@@ -15,10 +46,9 @@ class PDFProcessor:
 
     def __init__(self):
         
-        self.url_pattern = re.compile(
-            r'(?:https?://|www\.|file://)[^\s<>"]+|https?://[^\s<>"]+'
+        self.url_pattern = _url_regex.compile(
+            r'(?P<url>(?:https?://|www\.|file://)[^' + URL_WHITESPACE + r'<>"]+)'
         )
-        self.media_pattern = re.compile(r"\.(mp3|mp4|wav|m4a|pdf)\b", re.IGNORECASE)
 
     def _stitch_broken_urls(self, text: str) -> str:
         """
@@ -26,6 +56,48 @@ class PDFProcessor:
         """
         return text.replace("\n", "")
 
+    def _page_texts(self, pdf: pdfium.PdfDocument):
+        """Yields the text of each page, with PDFium's CRLF line breaks normalised."""
+        for page in pdf:
+            # Text pages and pages are closed as soon as they are read rather
+            # than left for the garbage collector, so only one stays loaded.
+            try:
+                textpage = page.get_textpage()
+                try:
+                    text = textpage.get_text_range()
+                finally:
+                    textpage.close()
+            finally:
+                page.close()
+            yield text.replace("\r\n", "\n")
+
+    def _extract_links(self, text: str) -> list:
+        """
+        Finds, cleans, de-duplicates and classifies every URL in the text in a
+        single pass over the stitched text.
+        """
+        stitched = self._stitch_broken_urls(text)
+        # Plain substring searches are far cheaper than the regex engine: skip it
+        # when no URL can be present, and otherwise start at the first candidate.
+        starts = [pos for pos in map(stitched.find, URL_MARKERS) if pos != -1]
+        if not starts:
+            return []
+        links = []
+        seen = set()
+        for match in self.url_pattern.finditer(stitched, min(starts)):
+            cleaned_url = match.group("url").rstrip(".,;)")
+            if cleaned_url in seen:
+                continue
+            seen.add(cleaned_url)
+            try:
+                path = urlparse(cleaned_url).path.lower()
+            except ValueError:
+                # A malformed host, e.g. an unbalanced "[" from broken text.
+                path = ""
+            link_type = "media" if path.endswith(MEDIA_EXTS) else "web"
+            links.append({"url": cleaned_url, "link_type": link_type})
+        return links
+
     def process_pdf(self, pdf_path: Path) -> dict:
         """
         Processes a PDF based on the critical business rule: SIZE FIRST.
@@ -33,58 +105,95 @@ class PDFProcessor:
         2. Large documents (> 3 pages) are treated as FULL TEXT TRANSCRIPTS, and any links within them are ignored.
         """
         try:
-            reader = PdfReader(pdf_path)
-            page_count = len(reader.pages)
+            if pdf_path.stat().st_size < MIN_PDF_BYTES:
+                logger.warning(
+                    f"📄 PDF {pdf_path.name} is under {MIN_PDF_BYTES} bytes. Skipping."
+                )
+                return {"type": "error", "message": "PDF file is empty or truncated"}
 
-            full_text = ""
-            for page in reader.pages:
-                text = page.extract_text()
-                if text:
-                    full_text += text + "\n"
+            pdf = pdfium.PdfDocument(pdf_path)
+            # Closed explicitly so the file handle and parsed document are released
+            # at once, even when a worker process parses many PDFs in a row.
+            try:
+                page_count = len(pdf)
+                if page_count == 0:
+                    logger.warning(f"📄 PDF {pdf_path.name} has no pages. Skipping.")
+                    return {"type": "error", "message": "PDF has no pages"}
 
-            char_count = len(full_text)
+                # RULE 1: If it's a LARGE document, it IS the transcript. End of story. IGNORE any links inside.
+                if page_count > 3:
+                    logger.info(
+                        f"📄 Large PDF ({page_count} pages) detected. Processing as FULL TEXT. Any internal links will be ignored."
+                    )
+                    full_text = "".join(
+                        f"{text}\n" for text in self._page_texts(pdf) if text
+                    )
+                    return {"type": "text", "content": full_text}
 
-            # RULE 1: If it's a LARGE document, it IS the transcript. End of story. IGNORE any links inside.
-            if page_count > 3:
-                logger.info(
-                    f"📄 Large PDF ({page_count} pages) detected. Processing as FULL TEXT. Any internal links will be ignored."
-                )
-                return {"type": "text", "content": full_text}
+                # For a SMALL document, pages are read one at a time and reading stops
+                # once a media link turns up, as that is the link the summarizer uses.
+                page_texts = []
+                for text in self._page_texts(pdf):
+                    if not text:
+                        continue
+                    page_texts.append(text + "\n")
+                    if any(
+                        link["link_type"] == "media" for link in self._extract_links(text)
+                    ):
+                        break
+                full_text = "".join(page_texts)
 
-            # RULE 2: If it's a SMALL document, it MUST be a pointer. Now, we find the link.
-            if char_count > 10:
+                char_count = len(full_text)
 
-                # Clean the text to handle links broken across multiple lines.
-                text_for_url_finding = self._stitch_broken_urls(full_text)
-                urls = self.url_pattern.findall(text_for_url_finding)
+                # RULE 2: If it's a SMALL document, it MUST be a pointer. Now, we find the link.
+                if char_count > 10:
 
-                if urls:
-                    extracted_links = []
-                    for url in urls:
-                        cleaned_url = url.rstrip(".,;)")
-                        link_type = (
-                            "media" if self.media_pattern.search(cleaned_url) else "web"
-                        )
-                        extracted_links.append(
-                            {"url": cleaned_url, "link_type": link_type}
-                        )
+                    # Links broken across multiple lines are stitched back together first.
+                    extracted_links = self._extract_links(full_text)
 
-                    logger.info(
-                        f"🔗 Small PDF ({page_count} pages) is a LINK POINTER. Extracted {len(extracted_links)} URL(s)."
-                    )
-                    return {"type": "link", "links": extracted_links}
+                    if extracted_links:
+                        logger.info(
+                            f"🔗 Small PDF ({page_count} pages) is a LINK POINTER. Extracted {len(extracted_links)} URL(s)."
+                        )
+                        return {"type": "link", "links": extracted_links}
 
-            # RULE 3: If it's small and has no links, or is just empty, it's useless.
-            logger.warning(
-                f"📄 Small PDF ({page_count} pages, {char_count} chars) has no actionable links or content. Skipping."
-            )
-            return {
-                "type": "error",
-                "message": "Small PDF with insufficient content or no links found",
-            }
+                # RULE 3: If it's small and has no links, or is just empty, it's useless.
+                logger.warning(
+                    f"📄 Small PDF ({page_count} pages, {char_count} chars) has no actionable links or content. Skipping."
+                )
+                return {
+                    "type": "error",
+                    "message": "Small PDF with insufficient content or no links found",
+                }
+            finally:
+                pdf.close()
 
         except Exception as e:
             logger.error(
                 f"❌ Failed to process PDF {pdf_path.name}: {e}", exc_info=True
             )
             return {"type": "error", "message": str(e)}
+
+
+def process_pdf_file(pdf_path: Path) -> dict:
+    """
+    Module-level entry point for PDFProcessor.process_pdf, so PDFs can be
+    parsed in a worker process (the processor holds no state worth sharing).
+    """
+    return PDFProcessor().process_pdf(pdf_path)
+
+
+def pdf_fingerprint(pdf_path: Path) -> str:
+    """
+    Content digest used to recognise a PDF that has been processed before.
+    The file is streamed unbuffered into a reusable per-thread buffer, so
+    hashing needs no per-file allocation and no full copy of the file.
+    """
+    buffer = getattr(_read_buffers, "buffer", None)
+    if buffer is None:
+        buffer = _read_buffers.buffer = memoryview(bytearray(READ_BUFFER_SIZE))
+    digest = hashlib.blake2b(digest_size=16)
+    with open(pdf_path, "rb", buffering=0) as f:
+        while read := f.readinto(buffer):
+            digest.update(buffer[:read])
+    return digest.hexdigest()
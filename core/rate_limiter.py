@@ -0,0 +1,155 @@
+# core/rate_limiter.py
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRateLimiter:
+    """
+    A token bucket for coroutines: up to 'max_rate' acquisitions may happen
+    back to back, and tokens refill at 'max_rate' per 'time_period' seconds.
+    Waiters are admitted in the order they arrived.
+
+    Usage:
+        limiter = AsyncRateLimiter(30, 1.0)
+        async with limiter:
+            await send()
+    """
+
+    def __init__(self, max_rate: float, time_period: float = 1.0):
+        self.max_rate = max_rate
+        self.time_period = time_period
+        self._tokens = float(max_rate)
+        self._last_refill = time.monotonic()
+        # asyncio.Lock wakes waiters first-in, first-out.
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._tokens = min(
+            self.max_rate, self._tokens + elapsed * self.max_rate / self.time_period
+        )
+
+    async def acquire(self) -> None:
+        """Waits until a token is available and takes it."""
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep(
+                    (1 - self._tokens) * self.time_period / self.max_rate
+                )
+                self._refill()
+            self._tokens -= 1
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+class CircuitBreaker:
+    """
+    Pauses all callers while a server is failing. After 'failure_threshold'
+    consecutive failures the circuit opens and admit() blocks for a cooldown
+    that starts at 'cooldown' seconds and doubles on every reopen, up to
+    'max_cooldown'. Once it elapses a single probe request is admitted; its
+    success closes the circuit, its failure opens it again.
+
+    Every admitted request must settle: record_success(), record_failure(),
+    or release_probe() when it ended any other way (a timeout, a 404, a
+    cancellation), so a half-open circuit never waits on a probe forever.
+
+    Usage:
+        await breaker.admit()
+        settled = False
+        try:
+            ...
+            await breaker.record_success()
+            settled = True
+        except ServerError:
+            await breaker.record_failure()
+            settled = True
+        finally:
+            if not settled:
+                breaker.release_probe()
+    """
+
+    def __init__(
+        self, failure_threshold: int, cooldown: float, max_cooldown: float = 300.0
+    ):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state = "closed"
+        self._failures = 0
+        self._trips = 0
+        self._probe_in_flight = False
+        self._lock = asyncio.Lock()
+        # Set whenever a caller may try to get in.
+        self._admitting = asyncio.Event()
+        self._admitting.set()
+
+    async def admit(self) -> None:
+        """Waits until the circuit lets a request through."""
+        while True:
+            await self._admitting.wait()
+            async with self._lock:
+                if self.state == "closed":
+                    return
+                if self.state == "half_open" and not self._probe_in_flight:
+                    self._probe_in_flight = True
+                    self._admitting.clear()
+                    return
+
+    async def record_success(self) -> None:
+        async with self._lock:
+            self._failures = 0
+            self._trips = 0
+            if self.state != "closed":
+                logger.info("🟢 Circuit closed: server is responding again.")
+                self.state = "closed"
+                self._probe_in_flight = False
+                self._admitting.set()
+
+    async def record_failure(self) -> None:
+        async with self._lock:
+            if self.state == "half_open":
+                self._trip()
+            elif self.state == "closed":
+                self._failures += 1
+                if self._failures >= self.failure_threshold:
+                    self._trip()
+
+    def release_probe(self) -> None:
+        """
+        Settles an admitted request that was neither a success nor a server
+        failure. If it was the half-open probe, the circuit stays half-open
+        and the next caller is admitted as the probe instead. Synchronous (it
+        never waits), so it is safe to call from a finally block even while
+        the caller is being cancelled.
+        """
+        if self.state == "half_open" and self._probe_in_flight:
+            self._probe_in_flight = False
+            self._admitting.set()
+
+    def _trip(self) -> None:
+        self._trips += 1
+        delay = min(self.cooldown * 2 ** (self._trips - 1), self.max_cooldown)
+        logger.warning(
+            f"🔴 Circuit open after repeated failures. Pausing requests for {delay:.1f}s..."
+        )
+        self.state = "open"
+        self._failures = 0
+        self._probe_in_flight = False
+        self._admitting.clear()
+        asyncio.get_running_loop().call_later(delay, self._half_open)
+
+    def _half_open(self) -> None:
+        self.state = "half_open"
+        self._admitting.set()
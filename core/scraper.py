@@ -1,27 +1,69 @@
 # core/scraper.py
-import requests
 from lxml import etree
 from datetime import datetime, timedelta
+import io
+import re
 from pathlib import Path
-import time
 import os
 from dotenv import load_dotenv
-import json
+import orjson
 import logging
 import asyncio
+import aiohttp
+from concurrent.futures import ProcessPoolExecutor
 from urllib.parse import urlparse
 from typing import Callable, Awaitable, Optional, Dict, Any, Tuple
 
 from .db_handler import DBHandler
-from .processor import PDFProcessor
+from .processor import process_pdf_file, pdf_fingerprint
 from .summarizer import GeminiSummarizer
 from .notifier import TelegramNotifier
 from .historical_db_handler import HistoricalDBHandler
 
 load_dotenv()
 
+# Announcements handled at once by a run; also the per-host connection cap of
+# the shared aiohttp session.
+MAX_CONCURRENT_ITEMS = 64
+# Announcement API pages fetched at once, kept low so BSE doesn't answer 429.
+MAX_CONCURRENT_PAGES = 8
+# Notifications sent at once; the notifier's rate limits still pace delivery.
+MAX_CONCURRENT_NOTIFICATIONS = 8
+# Only these HTTP statuses are worth retrying; other errors (e.g. 404) fail fast.
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# PDFs are streamed to disk in reads of up to this size, through a file
+# buffer of the same size, so a typical PDF costs a handful of writes.
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+# Everything except letters, digits and whitespace (\w also matches "_").
+_UNSAFE_NAME_CHARS = re.compile(r"[^\w\s]|_")
+
+
+def _stat_or_none(path: Path) -> Optional[os.stat_result]:
+    """One stat() call standing in for exists(); None if the file is missing."""
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
+
+
+def _is_usable_file(path: Path) -> bool:
+    """Whether the file exists and is not empty (a zero-byte PDF is unusable)."""
+    st = _stat_or_none(path)
+    return st is not None and st.st_size > 0
+
+
+def _safe_name(name: str) -> str:
+    """Company name reduced to letters, digits and spaces, for use in filenames."""
+    return _UNSAFE_NAME_CHARS.sub("", name).rstrip()
+
 
 class BSEScraper:
+    # iterparse tag filter for the XBRL attachment element in any namespace.
+    # lxml applies it while parsing, so only matching elements reach Python.
+    _ATTACHMENT_TAG = "{*}AttachmentURL"
+
     def __init__(self, test_mode=False):
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36",
@@ -32,6 +74,22 @@ class BSEScraper:
             "https://api.bseindia.com/BseIndiaAPI/api/AnnSubCategoryGetData/w"
         )
         self.xbrl_base_url = "https://www.bseindia.com/Msource/90D/CorpXbrlGen.aspx"
+        self.attachment_base_url = (
+            "https://www.bseindia.com/xml-data/corpfiling/AttachLive/"
+        )
+        # All BSE requests (API pages, XBRL and PDFs) share one pooled,
+        # keep-alive aiohttp session, created on first use inside the running
+        # event loop.
+        self._aio_session: Optional[aiohttp.ClientSession] = None
+        # Serializes JIT summarization per historical announcement, so items
+        # handled concurrently never download or summarize the same one twice.
+        self._jit_locks: Dict[str, asyncio.Lock] = {}
+        # Per-run memo of comparison lookups by (scrip_code, date): items that
+        # share a key reuse one lookup, even while it is still running.
+        self._prev_cache: Dict[Tuple[str, str], asyncio.Future] = {}
+        # XBRL lookups by NEWSID (None included), shared the same way, so a
+        # duplicated announcement never costs a second request to BSE.
+        self._xbrl_cache: Dict[str, asyncio.Future] = {}
         self.download_path = Path("downloads")
         self.download_path.mkdir(exist_ok=True)
         self.test_mode = test_mode
@@ -39,6 +97,12 @@ class BSEScraper:
         log_dir_path = Path("logs")
         log_dir_path.mkdir(exist_ok=True)
         self.url_log_file = log_dir_path / "pdf_urls.log"
+        # Test mode logs every URL, so the file stays open (buffered) for the
+        # scraper's lifetime instead of being reopened per announcement; each
+        # run flushes it when it finishes.
+        self._url_log_fh = (
+            open(self.url_log_file, "a", buffering=1 << 16) if test_mode else None
+        )
         self.db = DBHandler()
         try:
             self.historical_db = HistoricalDBHandler()
@@ -47,8 +111,10 @@ class BSEScraper:
                 "Historical DB not found. Comparison features will be disabled."
             )
             self.historical_db = None
-        self.pdf_processor = PDFProcessor()
-        self.summarizer = GeminiSummarizer()
+        # PDF parsing is CPU-bound, so it runs in worker processes instead of
+        # on the event loop.
+        self.pdf_pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+        self.summarizer = GeminiSummarizer(session_factory=self._get_aio_session)
         self.notifier = TelegramNotifier()
         self.start_date = os.getenv("START_DATE")
         self.end_date = os.getenv("END_DATE")
@@ -71,41 +137,104 @@ class BSEScraper:
                 "--- SCRAPER RUNNING IN TEST MODE: PDF downloads & Summarization are DISABLED. ---"
             )
 
-    def close_connections(self):
-        """Closes all database connections gracefully."""
+    async def poll_once(self) -> list:
+        """
+        Runs one polling cycle on a long-lived scraper: the same as run(), but
+        the database connections, PDF worker pool and HTTP sessions stay open
+        for the next cycle. Call aclose() once polling stops.
+        """
+        return await self.run(close=False)
+
+    async def aclose(self):
+        """Releases everything a long-lived scraper holds open."""
+        await self.close_connections()
+
+    async def close_connections(self):
+        """Closes all database connections and HTTP sessions gracefully."""
         self.logger.info("Closing database connections...")
         if self.db:
             self.db.close()
         if self.historical_db:
             self.historical_db.close()
+        self.pdf_pool.shutdown()
+        self._xbrl_cache.clear()
+        if self._url_log_fh:
+            self._url_log_fh.close()
+            self._url_log_fh = None
+        await self.summarizer.close()
+        if self._aio_session and not self._aio_session.closed:
+            await self._aio_session.close()
+
+    def _get_aio_session(self) -> aiohttp.ClientSession:
+        """Returns the shared aiohttp session, creating it on first use."""
+        if self._aio_session is None or self._aio_session.closed:
+            self._aio_session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=aiohttp.TCPConnector(
+                    limit_per_host=MAX_CONCURRENT_ITEMS, keepalive_timeout=30
+                ),
+            )
+        return self._aio_session
+
+    @staticmethod
+    def _retry_after(error: aiohttp.ClientResponseError) -> Optional[float]:
+        """The Retry-After delay of an error response in seconds, if it sent one."""
+        value = error.headers.get("Retry-After") if error.headers else None
+        try:
+            return max(float(value), 0.0) if value else None
+        except ValueError:
+            return None
 
-    def _make_resilient_request(
+    async def _make_resilient_request(
         self,
         method: str,
         url: str,
+        consume: Callable[[aiohttp.ClientResponse], Awaitable[Any]],
         retries: int = 5,
         backoff_factor: float = 2.0,
         **kwargs,
-    ) -> Optional[requests.Response]:
-        """A robust, centralized synchronous request handler with exponential backoff."""
-        session = requests.Session()
+    ) -> Any:
+        """
+        A robust, centralized async request handler with exponential backoff.
+        'consume' reads the successful response (while its connection is still
+        open) and its result is returned; None if every attempt failed. A body
+        'consume' cannot decode (ValueError) counts as a failed attempt.
+        Backoff waits are asyncio.sleep, so retries never stall other tasks.
+        Only connection errors, timeouts and RETRY_STATUSES are retried, and a
+        Retry-After header (in seconds) overrides the backoff.
+        """
+        session = self._get_aio_session()
         for attempt in range(retries):
             try:
-                response = session.request(method, url, **kwargs)
-                response.raise_for_status()
+                async with session.request(method, url, **kwargs) as response:
+                    response.raise_for_status()
+                    result = await consume(response)
                 if attempt > 0:
                     self.logger.info(
                         f"✅ Successfully completed request to {url} on attempt {attempt + 1}/{retries}."
                     )
-                return response
-            except requests.exceptions.RequestException as e:
+                return result
+            except aiohttp.ClientResponseError as e:
+                if e.status not in RETRY_STATUSES:
+                    self.logger.error(
+                        f"❌ Request to {url} failed with HTTP {e.status}. Not retrying."
+                    )
+                    return None
+                wait_time = self._retry_after(e) or backoff_factor * (2**attempt)
+                self.logger.warning(
+                    f"Request to {url} failed (Attempt {attempt + 1}/{retries}): HTTP {e.status}. Retrying in {wait_time:.2f}s..."
+                )
+                if attempt + 1 == retries:
+                    break
+                await asyncio.sleep(wait_time)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
                 wait_time = backoff_factor * (2**attempt)
                 self.logger.warning(
                     f"Request to {url} failed (Attempt {attempt + 1}/{retries}): {type(e).__name__}. Retrying in {wait_time:.2f}s..."
                 )
                 if attempt + 1 == retries:
                     break
-                time.sleep(wait_time)
+                await asyncio.sleep(wait_time)
         self.logger.error(
             f"❌ All {retries} retries failed for request to {url}. Giving up."
         )
@@ -133,34 +262,53 @@ class BSEScraper:
             "subcategory": "Earnings Call Transcript",
         }
 
-    def _make_api_request(self, params, retries=3, backoff_factor=5):
+    def _announcement_date(self, item: dict, today: str) -> str:
+        """
+        Returns the announcement's dissemination date as YYYY-MM-DD ('today' if
+        unparsable). DissemDT is ISO 8601, so its first ten characters are the
+        date and no datetime round-trip is needed.
+        """
+        date_part = item.get("DissemDT") or ""
+        date_part = date_part[:10] if isinstance(date_part, str) else ""
+        if len(date_part) == 10 and date_part.count("-") == 2:
+            return date_part
+        self.logger.warning(
+            f"Could not parse date for {item.get('NEWSID')}. Cannot perform historical lookup."
+        )
+        return today
+
+    @staticmethod
+    def _needs_sum(status: Optional[str]) -> bool:
+        """Whether a stored announcement status means it still needs a summary."""
+        return status == "DOWNLOADED"
+
+    @staticmethod
+    async def _read_json(response: aiohttp.ClientResponse) -> Any:
+        """Parses a JSON body with orjson (BSE labels it text/html, so no content-type check)."""
+        return orjson.loads(await response.read())
+
+    async def _make_api_request(self, params, retries=3, backoff_factor=5):
         """A resilient method to make an API request with retries."""
-        for attempt in range(retries):
-            try:
-                response = requests.get(
-                    self.api_url, headers=self.headers, params=params, timeout=60
-                )
-                response.raise_for_status()
-                return response.json()
-            except (requests.exceptions.RequestException, json.JSONDecodeError) as e:
-                self.logger.warning(
-                    f"Attempt {attempt + 1}/{retries} failed for page {params.get('pageno', 1)}: {e}"
-                )
-                if attempt + 1 == retries:
-                    self.logger.error(
-                        f"All {retries} retries failed for page {params.get('pageno', 1)}. Giving up."
-                    )
-                    return None
-                wait_time = backoff_factor * (2**attempt)
-                self.logger.info(f"Waiting for {wait_time} seconds before retrying...")
-                time.sleep(wait_time)
+        return await self._make_resilient_request(
+            "GET",
+            self.api_url,
+            self._read_json,
+            retries=retries,
+            backoff_factor=backoff_factor,
+            params=params,
+            timeout=aiohttp.ClientTimeout(sock_connect=60, sock_read=60),
+        )
 
-    def fetch_announcements(self):
-        """Fetches 'Earnings Call Transcript' announcements with smarter pagination and retries."""
+    async def fetch_announcements(self):
+        """
+        Fetches 'Earnings Call Transcript' announcements with smarter pagination and retries.
+        The first page gives the total count; the remaining pages are then
+        fetched concurrently, at most MAX_CONCURRENT_PAGES at a time.
+        """
         all_announcements = []
         params = self._get_api_params()
         self.logger.info("📡 Initial fetch to get total count...")
-        initial_data = self._make_api_request(params)
+        initial_data = await self._make_api_request(params)
         if not initial_data:
             return []
         total_records = initial_data.get("Table1", [{}])[0].get("ROWCNT", 0)
@@ -174,42 +322,63 @@ class BSEScraper:
         if records_per_page == 0:
             return []
         total_pages = (total_records + records_per_page - 1) // records_per_page
-        for page_no in range(2, total_pages + 1):
-            self.logger.info(f"📡 Fetching page {page_no}/{total_pages}...")
-            params["pageno"] = page_no
-            page_data = self._make_api_request(params)
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_PAGES)
+
+        async def fetch_page(page_no):
+            async with semaphore:
+                self.logger.info(f"📡 Fetching page {page_no}/{total_pages}...")
+                return await self._make_api_request({**params, "pageno": page_no})
+
+        page_numbers = range(2, total_pages + 1)
+        pages = await asyncio.gather(*(fetch_page(page_no) for page_no in page_numbers))
+        for page_no, page_data in zip(page_numbers, pages):
             if not page_data or not page_data.get("Table"):
-                self.logger.error(
-                    f"Failed to retrieve data for page {page_no}. Stopping pagination."
-                )
-                break
+                self.logger.error(f"Failed to retrieve data for page {page_no}.")
+                continue
             all_announcements.extend(page_data.get("Table", []))
         self.logger.info(
             f"✔️ Fetched a total of {len(all_announcements)} announcements."
         )
         return all_announcements
 
-    def get_pdf_url_from_xbrl(self, news_id, scrip_code):
+    async def get_pdf_url_from_xbrl(self, news_id, scrip_code):
+        """
+        Returns the AttachmentURL from the announcement's XBRL, fetching it at
+        most once per NEWSID; concurrent callers await the same request.
+        """
+        lookup = self._xbrl_cache.get(news_id)
+        if lookup is None:
+            lookup = self._xbrl_cache[news_id] = asyncio.ensure_future(
+                self._fetch_pdf_url_from_xbrl(news_id, scrip_code)
+            )
+        return await asyncio.shield(lookup)
+
+    async def _fetch_pdf_url_from_xbrl(self, news_id, scrip_code):
         params = {"Bsenewid": news_id, "Scripcode": scrip_code}
-        response = self._make_resilient_request(
-            "GET", self.xbrl_base_url, params=params, headers=self.headers, timeout=15
+        content = await self._make_resilient_request(
+            "GET",
+            self.xbrl_base_url,
+            lambda response: response.read(),
+            params=params,
+            timeout=aiohttp.ClientTimeout(sock_connect=15, sock_read=15),
         )
-        if not response:
+        if not content:
             self.logger.error(
                 f"❌ Failed to fetch XBRL for NEWSID {news_id} after all retries."
             )
             return None
         try:
-            root = etree.fromstring(response.content)
-            for elem in root.getiterator():
-                if not hasattr(elem.tag, "find"):
-                    continue
-                i = elem.tag.find("}")
-                if i >= 0:
-                    elem.tag = elem.tag[i + 1 :]
-            pdf_url_element = root.find(".//AttachmentURL")
-            if pdf_url_element is not None and pdf_url_element.text:
-                return pdf_url_element.text
+            # Streams the document and stops at the first AttachmentURL,
+            # whatever its namespace, instead of building the whole tree.
+            pdf_url = None
+            for _, elem in etree.iterparse(
+                io.BytesIO(content), events=("end",), tag=self._ATTACHMENT_TAG
+            ):
+                pdf_url = elem.text
+                elem.clear()
+                break
+            if pdf_url:
+                return pdf_url
             self.logger.warning(f"⚠️ Could not find AttachmentURL for NEWSID {news_id}")
             return None
         except etree.XMLSyntaxError as e:
@@ -218,19 +387,48 @@ class BSEScraper:
             )
             return None
 
-    def download_pdf(
+    def _direct_pdf_url(self, item: dict) -> Optional[str]:
+        """The AttachLive URL built from the item's ATTACHMENTNAME, if it has one."""
+        attachment_name = (item.get("ATTACHMENTNAME") or "").strip()
+        return f"{self.attachment_base_url}{attachment_name}" if attachment_name else None
+
+    async def _resolve_pdf_url(self, item: dict, news_id, scrip_code) -> Optional[str]:
+        """
+        Returns the PDF URL for an announcement. The AttachLive URL is tried
+        first with a single HEAD request, which saves the XBRL round-trip;
+        XBRL is only asked when there is no attachment name or the HEAD fails.
+        """
+        direct_url = self._direct_pdf_url(item)
+        if direct_url:
+            try:
+                async with self._get_aio_session().head(
+                    direct_url,
+                    allow_redirects=True,
+                    timeout=aiohttp.ClientTimeout(sock_connect=15, sock_read=15),
+                ) as response:
+                    if response.status == 200:
+                        return direct_url
+                    self.logger.info(
+                        f"AttachLive URL for NEWSID {news_id} returned HTTP {response.status}. Falling back to XBRL."
+                    )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.logger.info(
+                    f"AttachLive check for NEWSID {news_id} failed ({type(e).__name__}). Falling back to XBRL."
+                )
+        return await self.get_pdf_url_from_xbrl(news_id, scrip_code)
+
+    async def download_pdf(
         self, pdf_url: str, scrip_code: str, company_name: str, news_id: str
     ) -> Path | None:
         if self.test_mode:
             log_entry = f"{datetime.now().isoformat()} | {company_name} | {pdf_url}\n"
-            with open(self.url_log_file, "a") as f:
-                f.write(log_entry)
+            self._url_log_fh.write(log_entry)
             self.logger.info(f"📝 Logged URL for {company_name}")
             return None
         if pdf_url.startswith("file://"):
             try:
                 local_path = Path(urlparse(pdf_url).path)
-                if local_path.exists():
+                if _is_usable_file(local_path):
                     self.logger.info(f"✅ Accessed local test PDF: {local_path}")
                     return local_path
                 else:
@@ -241,36 +439,135 @@ class BSEScraper:
                 return None
         else:
             self.logger.info(f"⬇️ Downloading PDF for {company_name} from {pdf_url}")
-            response = self._make_resilient_request(
-                "GET", pdf_url, headers=self.headers, timeout=60, stream=True
-            )
-            if not response:
-                self.logger.error(
-                    f"❌ Failed to download PDF for NEWSID {news_id} after all retries."
-                )
-                return None
-            try:
-                safe_name = "".join(
-                    [c for c in company_name if c.isalnum() or c.isspace()]
-                ).rstrip()
-                filename = f"{scrip_code}_{safe_name}_{news_id[:8]}.pdf"
-                filepath = self.download_path / filename
-                with open(filepath, "wb") as f:
-                    for chunk in response.iter_content(chunk_size=8192):
+            filename = f"{scrip_code}_{_safe_name(company_name)}_{news_id[:8]}.pdf"
+            filepath = self.download_path / filename
+
+            async def save(response: aiohttp.ClientResponse) -> Path:
+                # Each attempt rewrites the file from the start.
+                with open(filepath, "wb", buffering=DOWNLOAD_CHUNK_SIZE) as f:
+                    async for chunk in response.content.iter_chunked(
+                        DOWNLOAD_CHUNK_SIZE
+                    ):
                         f.write(chunk)
-                self.logger.info(f"💾 Saved PDF to {filepath}")
                 return filepath
+
+            try:
+                saved = await self._make_resilient_request(
+                    "GET",
+                    pdf_url,
+                    save,
+                    timeout=aiohttp.ClientTimeout(sock_connect=60, sock_read=60),
+                )
             except Exception as e:
                 self.logger.error(
                     f"❌ Failed to save downloaded PDF for NEWSID {news_id} to disk: {e}"
                 )
+                saved = None
+            if not saved:
+                # Never leave a partial file that a later run would take for
+                # a complete download.
+                filepath.unlink(missing_ok=True)
+                self.logger.error(
+                    f"❌ Failed to download PDF for NEWSID {news_id} after all retries."
+                )
                 return None
+            self.logger.info(f"💾 Saved PDF to {filepath}")
+            return filepath
+
+    async def _process_pdf(self, pdf_path: Path) -> dict:
+        """
+        Runs PDF processing in the process pool, keeping the event loop free.
+        Results are cached by file digest, so a PDF seen before (a re-run, or a
+        templated notice with identical bytes) is not parsed again.
+        """
+        try:
+            digest = await asyncio.to_thread(pdf_fingerprint, pdf_path)
+        except OSError as e:
+            self.logger.warning(f"Could not fingerprint {pdf_path.name}: {e}")
+            digest = None
+        if digest and (cached := await self.db.get_cached_pdf_result(digest)):
+            self.logger.info(
+                f"📄 {pdf_path.name} matches a cached '{cached.get('type')}' result. Skipping parse."
+            )
+            return cached
+
+        loop = asyncio.get_running_loop()
+        try:
+            content_data = await loop.run_in_executor(
+                self.pdf_pool, process_pdf_file, pdf_path
+            )
+        except Exception as e:
+            self.logger.error(
+                f"❌ PDF worker failed for {pdf_path.name}: {e}", exc_info=True
+            )
+            return {"type": "error", "message": str(e)}
+        # Worker-process log records don't reach this process's queued file
+        # handler, so the outcome is logged here as well.
+        self.logger.info(
+            f"📄 Processed {pdf_path.name} as '{content_data.get('type')}'."
+        )
+        # Errors are not cached: they may come from a transient failure.
+        if digest and content_data.get("type") != "error":
+            self.db.cache_pdf_result(digest, content_data)
+        return content_data
+
+    def _save_historical_summary(self, prev_ann: Dict[str, Any], summary: dict):
+        """
+        Persists a JIT summary and mirrors it into the (possibly prefetched and
+        shared) row, so later items comparing against it reuse it.
+        """
+        self.historical_db.update_summary(prev_ann["news_id"], summary)
+        prev_ann["summary_json"] = orjson.dumps(summary)
+
+    async def _prefetch_previous_announcements(
+        self, pairs: list[tuple[str, str]]
+    ) -> Optional[Dict[Tuple[str, str], Dict[str, Any]]]:
+        """
+        Looks up the previous announcement for every (scrip_code, date) pair of
+        a run in one batched query. Returns None (per-item lookups) without a
+        historical DB or if the batched query fails.
+        """
+        if not self.historical_db or not pairs:
+            return None
+        prefetched = await asyncio.to_thread(
+            self.historical_db.get_latest_for_many, pairs
+        )
+        if prefetched is not None:
+            self.logger.info(
+                f"🔎 Prefetched previous announcements for {len(prefetched)}/{len(set(pairs))} scrip/date pairs."
+            )
+        return prefetched
 
     async def _get_historical_summary_for_comparison(
-        self, scrip_code: str, current_ann_date: str
+        self,
+        scrip_code: str,
+        current_ann_date: str,
+        prefetched: Optional[Dict[Tuple[str, str], Dict[str, Any]]] = None,
+    ) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        Memoized form of _find_historical_summary: the first call for a
+        (scrip_code, date) in a run does the work, and later or concurrent
+        calls await the same result. Negative outcomes (no previous
+        announcement, a web-link record) are remembered too.
+        """
+        key = (scrip_code, current_ann_date)
+        lookup = self._prev_cache.get(key)
+        if lookup is None:
+            lookup = self._prev_cache[key] = asyncio.ensure_future(
+                self._find_historical_summary(scrip_code, current_ann_date, prefetched)
+            )
+        # Shielded, so one cancelled caller doesn't cancel the shared lookup.
+        return await asyncio.shield(lookup)
+
+    async def _find_historical_summary(
+        self,
+        scrip_code: str,
+        current_ann_date: str,
+        prefetched: Optional[Dict[Tuple[str, str], Dict[str, Any]]] = None,
     ) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
         """
         Finds the most recent prior announcement and performs "Just-in-Time" summarization.
+        - Uses the row from 'prefetched' (see _prefetch_previous_announcements) when given.
         - Processes historical media links.
         - Aborts if the historical document is a non-media web link.
         - Returns both the summary and a context dictionary with relevant URLs.
@@ -280,9 +577,15 @@ class BSEScraper:
         self.logger.info(
             f"🔄 [{scrip_code}] Searching for previous announcement before {current_ann_date}..."
         )
-        prev_ann = self.historical_db.get_latest_announcement_for_scrip(
-            scrip_code, current_ann_date
-        )
+        if prefetched is not None:
+            prev_ann = prefetched.get((scrip_code, current_ann_date))
+        else:
+            # Runs on a worker thread, which gets its own read-only connection.
+            prev_ann = await asyncio.to_thread(
+                self.historical_db.get_latest_announcement_for_scrip,
+                scrip_code,
+                current_ann_date,
+            )
         if not prev_ann:
             self.logger.info(
                 f"[{scrip_code}] No previous announcements found in historical DB."
@@ -291,10 +594,21 @@ class BSEScraper:
         self.logger.info(
             f"[{scrip_code}] Found previous announcement: {prev_ann['news_id']} from {prev_ann['announcement_date']}"
         )
+        lock = self._jit_locks.setdefault(prev_ann["news_id"], asyncio.Lock())
+        async with lock:
+            return await self._summary_for_previous(scrip_code, prev_ann)
+
+    async def _summary_for_previous(
+        self, scrip_code: str, prev_ann: Dict[str, Any]
+    ) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        Returns the cached summary of a previous announcement, or generates it
+        Just-in-Time. Called under that announcement's JIT lock.
+        """
         comparison_context = {"comparison_pdf_url": prev_ann.get("pdf_url")}
         if prev_ann.get("summary_json"):
             try:
-                summary = json.loads(prev_ann["summary_json"])
+                summary = orjson.loads(prev_ann["summary_json"])
                 if summary.get("type") == "summary":
                     self.logger.info(
                         f"[{scrip_code}] Previous summary already cached. Using it."
@@ -305,7 +619,7 @@ class BSEScraper:
                         f"[{scrip_code}] Cached historical record is not a valid summary. Skipping."
                     )
                     return None
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 self.logger.warning(
                     f"[{scrip_code}] Failed to parse cached summary. Will regenerate."
                 )
@@ -314,18 +628,18 @@ class BSEScraper:
         )
         pdf_path = None
         try:
-            pdf_path = self.download_pdf(
+            pdf_path = await self.download_pdf(
                 prev_ann["pdf_url"],
-                str(scrip_code),
+                scrip_code,
                 prev_ann["company_name"],
                 prev_ann["news_id"],
             )
-            if not pdf_path or not pdf_path.exists():
+            if not pdf_path or not _is_usable_file(pdf_path):
                 self.logger.error(
                     f"[{scrip_code}] JIT Failed: Could not download historical PDF."
                 )
                 return None
-            content_data = self.pdf_processor.process_pdf(pdf_path)
+            content_data = await self._process_pdf(pdf_path)
             summary_json = await self.summarizer.summarize(
                 content_data,
                 prev_ann["company_name"],
@@ -337,14 +651,14 @@ class BSEScraper:
                 self.logger.warning(
                     f"[{scrip_code}] JIT Aborted: Historical PDF {prev_ann['news_id']} is an external web link. Ignoring for comparison."
                 )
-                self.historical_db.update_summary(prev_ann["news_id"], summary_json)
+                self._save_historical_summary(prev_ann, summary_json)
                 return None
             if summary_json and summary_json.get("type") == "summary":
                 if media_links := summary_json.get("links", []):
                     comparison_context["comparison_media_url"] = media_links[0].get(
                         "url"
                     )
-                self.historical_db.update_summary(prev_ann["news_id"], summary_json)
+                self._save_historical_summary(prev_ann, summary_json)
                 self.logger.info(
                     f"[{scrip_code}] JIT Success: Generated and saved historical summary."
                 )
@@ -354,7 +668,7 @@ class BSEScraper:
                     f"[{scrip_code}] JIT summary generation failed. Cannot use for comparison."
                 )
                 if summary_json:
-                    self.historical_db.update_summary(prev_ann["news_id"], summary_json)
+                    self._save_historical_summary(prev_ann, summary_json)
                 return None
         except Exception as e:
             self.logger.error(
@@ -363,9 +677,11 @@ class BSEScraper:
             )
             return None
         finally:
-            if pdf_path and pdf_path.exists():
+            if pdf_path:
                 try:
                     pdf_path.unlink()
+                except FileNotFoundError:
+                    pass
                 except OSError as e:
                     self.logger.warning(
                         f"Could not delete JIT temporary file {pdf_path}: {e}"
@@ -380,17 +696,14 @@ class BSEScraper:
         previous_summary: Optional[Dict] = None,
         comparison_context: Optional[Dict] = None,
     ):
+        # Only called for items the run's status snapshot marks as needing a
+        # summary (see run), so no per-item status query is made here.
         if self.test_mode:
             self.logger.info("Summarization skipped in test mode.")
             return None
-        if not self.db.needs_summarization(news_id):
-            self.logger.info(
-                f"🔵 Item {news_id} already processed/summarized. Skipping."
-            )
-            return None
 
         self.logger.info(f"⚙️ Processing PDF for {company_name} ({news_id})...")
-        content_data = self.pdf_processor.process_pdf(pdf_path)
+        content_data = await self._process_pdf(pdf_path)
 
         summary_data = await self.summarizer.summarize(
             content_data, company_name, pdf_url, previous_summary
@@ -411,7 +724,7 @@ class BSEScraper:
             "PROCESSED" if summary_data.get("type") != "error" else "ERROR_PROCESSING"
         )
         self.db.update_summary(news_id, summary_data, status)
-        self.logger.info(f"💾 Updated database for {news_id} with status: {status}")
+        self.logger.info(f"💾 Queued database update for {news_id} with status: {status}")
 
         if status == "PROCESSED":
             if summary_data.get("type") == "summary":
@@ -433,110 +746,241 @@ class BSEScraper:
     async def run_all_notifications_sequentially(
         self, tasks: list[Callable[[], Awaitable[None]]]
     ) -> None:
-        """Runs notification tasks one by one with a 2-second delay between each."""
+        """
+        Runs notification tasks one by one. Pacing is left to the notifier's
+        rate limits, so there is no fixed delay between sends.
+        """
         if not tasks:
             return
         total = len(tasks)
-        self.logger.info(
-            "--- Sending %s notifications sequentially (1 per 2 s) ---", total
-        )
+        self.logger.info("--- Sending %s notifications sequentially ---", total)
         for idx, task_factory in enumerate(tasks, 1):
             self.logger.info("  -> notification %s/%s", idx, total)
             await task_factory()
-            if idx < total:
-                await asyncio.sleep(2)
         self.logger.info("--- All notifications sent successfully ---")
 
-    async def run(self, announcements_override=None) -> list:
+    async def run_all_notifications_concurrently(
+        self,
+        tasks: list[Callable[[], Awaitable[None]]],
+        limit: int = MAX_CONCURRENT_NOTIFICATIONS,
+    ) -> None:
+        """
+        Runs notification tasks with up to 'limit' in flight, so their network
+        waits overlap. The notifier's per-chat and global rate limits still
+        apply, and admit sends in the order the tasks were given. A failed task
+        is logged and doesn't stop the others. The sequential version is kept
+        for debugging.
+        """
+        if not tasks:
+            return
+        total = len(tasks)
+        self.logger.info(
+            "--- Sending %s notifications (up to %s at once) ---", total, limit
+        )
+        semaphore = asyncio.Semaphore(limit)
+
+        async def bounded(task_factory):
+            async with semaphore:
+                return await task_factory()
+
+        results = await asyncio.gather(
+            *(bounded(task_factory) for task_factory in tasks), return_exceptions=True
+        )
+        failures = [r for r in results if isinstance(r, BaseException)]
+        for failure in failures:
+            self.logger.error(
+                "❌ Notification task failed: %s", failure, exc_info=failure
+            )
+        self.logger.info(
+            "--- Notifications done: %s sent, %s failed ---",
+            total - len(failures),
+            len(failures),
+        )
+
+    async def _handle_item(
+        self,
+        item: dict,
+        announcement_date: str,
+        known_ids: set,
+        pending_summary: set,
+        pending_rows: list,
+        prefetched: Optional[Dict[Tuple[str, str], Dict[str, Any]]],
+    ) -> Optional[Callable[[], Awaitable[None]]]:
+        """
+        Downloads (when new) and summarizes one announcement. Returns its
+        notification task factory, if it produced one.
+        """
+        news_id = item.get("NEWSID")
+        scrip_code = str(item.get("SCRIP_CD"))
+        name = item.get("SLONGNAME", "N/A").strip()
+        pdf_path = None
+        pdf_url = item.get("PDF_URL_OVERRIDE")
+        historical_result = None
+        historical_fetched = False
+        if news_id not in known_ids:
+            if not pdf_url:
+                pdf_url = await self._resolve_pdf_url(item, news_id, scrip_code)
+            if pdf_url:
+                download = self.download_pdf(pdf_url, scrip_code, name, news_id)
+                if self.test_mode:
+                    pdf_path = await download
+                else:
+                    # The comparison summary doesn't depend on this PDF, so its
+                    # lookup (and any JIT download + summary) overlaps the download.
+                    pdf_path, historical_result = await asyncio.gather(
+                        download,
+                        self._get_historical_summary_for_comparison(
+                            scrip_code, announcement_date, prefetched
+                        ),
+                    )
+                    historical_fetched = True
+                if pdf_path:
+                    self.db.add_new_announcement(
+                        news_id, scrip_code, name, pdf_url
+                    )
+                elif self.test_mode:
+                    pending_rows.append((news_id, scrip_code, name, pdf_url))
+                elif item.get("is_test"):
+                    self.db.add_new_announcement(
+                        news_id, scrip_code, name, pdf_url
+                    )
+                if pdf_path or self.test_mode or item.get("is_test"):
+                    known_ids.add(news_id)
+                    pending_summary.add(news_id)
+        if not (pdf_path or news_id in pending_summary):
+            return None
+        if not pdf_path:
+            filename = f"{scrip_code}_{_safe_name(name)}_{news_id[:8]}.pdf"
+            pdf_path = self.download_path / filename
+        if not _is_usable_file(pdf_path):
+            self.logger.warning(
+                f"⚠️ PDF for {name} ({news_id}) not found, cannot process."
+            )
+            return None
+        if not pdf_url:
+            # Rows recorded before URLs were stored fall back to BSE.
+            pdf_url = (
+                await self.db.get_pdf_url(news_id)
+                or await self.get_pdf_url_from_xbrl(news_id, scrip_code)
+                or ""
+            )
+        previous_summary = None
+        comparison_context = None
+        if not historical_fetched:
+            historical_result = await self._get_historical_summary_for_comparison(
+                scrip_code, announcement_date, prefetched
+            )
+        if historical_result:
+            previous_summary, comparison_context = historical_result
+        notification_task_factory = await self.process_and_summarize(
+            pdf_path,
+            news_id,
+            name,
+            pdf_url,
+            previous_summary,
+            comparison_context,
+        )
+        pending_summary.discard(news_id)
+        return notification_task_factory
+
+    async def run(self, announcements_override=None, close=True) -> list:
+        """
+        Runs one scrape and returns its notification tasks. With close=False
+        the connections are left open, so the scraper can run again.
+        """
         self.logger.info("--- Starting BSE Scraper Run ---")
+        # Per-run memos; clearing them keeps a long-lived scraper's memory flat.
+        self._prev_cache.clear()
+        self._xbrl_cache.clear()
+        self._jit_locks.clear()
         announcements = (
             announcements_override
             if announcements_override is not None
-            else self.fetch_announcements()
+            else await self.fetch_announcements()
         )
         if not announcements:
             self.logger.info("--- No announcements found. Ending run. ---")
-            self.close_connections()
+            if close:
+                await self.close_connections()
             return []
+        statuses = await self.db.get_statuses(
+            [item["NEWSID"] for item in announcements if item.get("NEWSID")]
+        )
+        known_ids = set(statuses)
+        pending_summary = {
+            news_id for news_id, status in statuses.items() if self._needs_sum(status)
+        }
+        # Test-mode rows are never summarized in this run, so they are
+        # collected and written in one transaction at the end.
+        pending_rows: list[tuple[str, str, str, Optional[str]]] = []
+        today = datetime.now().strftime("%Y-%m-%d")
+        ordered = [
+            (item, self._announcement_date(item, today))
+            for item in reversed(announcements)
+        ]
+        # The run's items are chosen up front, in announcement order, so the
+        # processing limit applies as before; they are then handled
+        # concurrently and their notifications kept in that order.
+        selected = []
+        selected_ids = set()
         new_items_processed = 0
-        notification_tasks: list[Callable[[], Awaitable[None]]] = []
-        for item in reversed(announcements):
+        for item, announcement_date in ordered:
             if self.max_items > 0 and new_items_processed >= self.max_items:
                 self.logger.warning(
                     f"🛑 Reached processing limit of {self.max_items}. Halting run."
                 )
                 break
             news_id = item.get("NEWSID")
-            scrip_code = str(item.get("SCRIP_CD"))
-            name = item.get("SLONGNAME", "N/A").strip()
-            try:
-                dissem_dt_str = item.get("DissemDT", "")
-                announcement_date = datetime.fromisoformat(dissem_dt_str).strftime(
-                    "%Y-%m-%d"
-                )
-            except (ValueError, TypeError):
-                self.logger.warning(
-                    f"Could not parse date for {news_id}. Cannot perform historical lookup."
-                )
-                announcement_date = datetime.now().strftime("%Y-%m-%d")
-            if not news_id:
+            if not news_id or news_id in selected_ids:
                 continue
-            if self.db.is_processed(news_id) and not self.db.needs_summarization(
-                news_id
-            ):
+            if news_id in known_ids and news_id not in pending_summary:
                 continue
-            pdf_path = None
-            pdf_url = item.get("PDF_URL_OVERRIDE")
-            if not self.db.is_processed(news_id):
+            selected_ids.add(news_id)
+            if news_id not in known_ids:
                 new_items_processed += 1
+                name = item.get("SLONGNAME", "N/A").strip()
                 self.logger.info(
                     f"✨ New item found for {name} ({news_id}) [Item {new_items_processed}/{self.max_items if self.max_items > 0 else '∞'}]"
                 )
-                if not pdf_url:
-                    pdf_url = self.get_pdf_url_from_xbrl(news_id, scrip_code)
-                if pdf_url:
-                    pdf_path = self.download_pdf(
-                        pdf_url, str(scrip_code), name, news_id
-                    )
-                    if pdf_path:
-                        self.db.add_new_announcement(news_id, str(scrip_code), name)
-                    elif self.test_mode or item.get("is_test"):
-                        self.db.add_new_announcement(news_id, str(scrip_code), name)
-            if pdf_path or (
-                self.db.is_processed(news_id) and self.db.needs_summarization(news_id)
-            ):
-                if not pdf_path:
-                    safe_name = "".join(
-                        [c for c in name if c.isalnum() or c.isspace()]
-                    ).rstrip()
-                    filename = f"{scrip_code}_{safe_name}_{news_id[:8]}.pdf"
-                    pdf_path = self.download_path / filename
-                if pdf_path.exists():
-                    if not pdf_url:
-                        pdf_url = self.get_pdf_url_from_xbrl(news_id, scrip_code) or ""
-                    previous_summary = None
-                    comparison_context = None
-                    historical_result = (
-                        await self._get_historical_summary_for_comparison(
-                            scrip_code, announcement_date
-                        )
-                    )
-                    if historical_result:
-                        previous_summary, comparison_context = historical_result
-                    notification_task_factory = await self.process_and_summarize(
-                        pdf_path,
-                        news_id,
-                        name,
-                        pdf_url,
-                        previous_summary,
-                        comparison_context,
-                    )
-                    if notification_task_factory:
-                        notification_tasks.append(notification_task_factory)
-                else:
-                    self.logger.warning(
-                        f"⚠️ PDF for {name} ({news_id}) not found, cannot process."
-                    )
+            selected.append((item, announcement_date))
+        # Only the selected items' comparisons are looked up, so a run capped
+        # by MAX_ITEMS_TO_PROCESS doesn't resolve the whole API window.
+        prefetched = await self._prefetch_previous_announcements(
+            [
+                (str(item.get("SCRIP_CD")), announcement_date)
+                for item, announcement_date in selected
+            ]
+        )
+
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_ITEMS)
+
+        async def handle(item, announcement_date):
+            async with semaphore:
+                return await self._handle_item(
+                    item,
+                    announcement_date,
+                    known_ids,
+                    pending_summary,
+                    pending_rows,
+                    prefetched,
+                )
+
+        results = await asyncio.gather(
+            *(handle(item, announcement_date) for item, announcement_date in selected),
+            return_exceptions=True,
+        )
+        notification_tasks: list[Callable[[], Awaitable[None]]] = []
+        for (item, _), result in zip(selected, results):
+            if isinstance(result, BaseException):
+                self.logger.error(
+                    f"❌ Failed to handle announcement {item.get('NEWSID')}: {result}",
+                    exc_info=result,
+                )
+            elif result:
+                notification_tasks.append(result)
+        if pending_rows:
+            self.db.add_new_announcements_bulk(pending_rows)
+            self.logger.info(f"💾 Recorded {len(pending_rows)} logged announcements.")
         if notification_tasks:
             self.logger.info(
                 f"📦 Scraper run produced {len(notification_tasks)} notification tasks to be sent."
@@ -550,6 +994,9 @@ class BSEScraper:
             self.logger.info(
                 f"✨ Run complete. Found and {action} {new_items_processed} new announcements."
             )
+        if self._url_log_fh:
+            self._url_log_fh.flush()
         self.logger.info("--- BSE Scraper Run Finished ---")
-        self.close_connections()
+        if close:
+            await self.close_connections()
         return notification_tasks
@@ -1,53 +1,203 @@
 # core/summarizer.py
 import os
-import json
+import asyncio
+import copy
+import datetime
+import hashlib
 import logging
-import requests
+import re
 from pathlib import Path
-import time
 import mimetypes
 import random
-from json import JSONDecodeError
-from typing import Optional, Dict, Callable
+from typing import Optional, Dict, List, Callable, Awaitable, Tuple, Any
 
+import aiohttp
+import orjson
 import google.generativeai as genai
-import urllib3
+from pydantic import TypeAdapter
 
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from .rate_limiter import AsyncRateLimiter
+from .summary_schema import (
+    HISTORICAL_BATCH_OUTPUT,
+    HISTORICAL_OUTPUT,
+    STRUCTURED_OUTPUT,
+    OutputFormat,
+)
 
 logger = logging.getLogger()
 
 TARGET_CHAR_LIMIT = 2800
 
+# Appended to the prompt when a reply failed to parse or validate, so the
+# retry corrects the mistake instead of repeating the same request.
+RETRY_FEEDBACK = (
+    "Your previous reply was rejected: {error}\n"
+    "Reply again with only a JSON object that matches the required schema."
+)
+RETRY_FEEDBACK_CHARS = 1000
+
+# Gemini requests allowed in flight at once across all summarize() calls.
+MAX_CONCURRENT_LLM = 8
+# Default Gemini request rate; GEMINI_REQUESTS_PER_MINUTE overrides it to
+# match the key's quota.
+GEMINI_REQUESTS_PER_MINUTE = 60
+
+MEDIA_DOWNLOAD_CHUNK_SIZE = 1 << 16
+MEDIA_POLL_SECONDS = 2
+# Media summaries run as download -> upload/poll -> generate, each stage
+# bounded separately (generation by MAX_CONCURRENT_LLM), so one file's
+# processing wait overlaps the next file's download instead of queueing it.
+MAX_CONCURRENT_MEDIA_DOWNLOADS = 4
+MAX_CONCURRENT_MEDIA_UPLOADS = 4
+
+MODEL_NAME = "gemini-flash-latest"
+
+# The company-name fallback looks at this much of the transcript. Most open
+# with "... Earnings Conference Call of <Name> Limited", which needs no model.
+COMPANY_NAME_TEXT_CHARS = 4000
+COMPANY_NAME_PATTERN = re.compile(
+    r"(?i:earnings\s+(?:conference\s+)?call\s+of\s+)"
+    r"([A-Z][\w&.,'()\- ]{1,120}?\s(?i:Limited|Ltd\.?))(?!\w)"
+)
+
+# Parsed Gemini responses, one JSON file per prompt/content/model key, so
+# reprocessing an announcement does not pay for the same call twice.
+LLM_CACHE_DIR = Path("llm_cache")
+# Once the cache holds more files than this, the least recently used go.
+LLM_CACHE_MAX_ENTRIES = 20000
+
+# With GEMINI_CONTEXT_CACHE=1 the structured prompt's static prefix is kept in
+# an explicit Gemini context cache, shared by runs until it expires.
+CONTEXT_CACHE_TTL = datetime.timedelta(hours=6)
+CONTEXT_CACHE_MIN_REMAINING = datetime.timedelta(minutes=10)
+
+# Historical (JIT) text summaries requested close together are sent to Gemini
+# as one request: up to this many documents, within this many characters of
+# transcript, collected for at most this long. Only requests made while
+# another is already under way wait; a lone request is sent at once.
+HISTORICAL_BATCH_SIZE = 8
+MAX_BATCH_PROMPT_CHARS = 600_000
+HISTORICAL_BATCH_WAIT_SECONDS = 0.5
+
+
+# Instruction blocks that are identical on every call. They come first in
+# each request so Gemini's implicit prefix cache can reuse them; the company
+# and the previous-call context follow in a short per-call tail.
+HISTORICAL_PROMPT_PREFIX = f"""
+You are an expert financial analyst AI. Your task is to create a concise summary of the provided historical earnings call transcript for the company named at the end of these instructions. This summary will be used for comparison against a future call.
 
-def _gemini_call_with_retry(call_fn: Callable, *, desc="gemini_call", max_attempts=3):
+**Instructions:**
+1.  **Focus on Key Outcomes:** Extract the main financial results, strategic goals stated at the time, and any major risks discussed.
+2.  **Be Concise:** The entire output must be a single, valid JSON object and should be well under {TARGET_CHAR_LIMIT} characters.
+3.  **Keys:** "es" is a 2-3 sentence summary of the call's key outcome, "kf" the key financial metrics, "so" the strategic goals and promises, "rc" the risks mentioned. Set "type" to "summary".
+"""
+
+STRUCTURED_PROMPT_PREFIX = f"""
+You are an expert financial analyst AI. Your analysis is concise, data-driven, and rivals a seasoned human analyst. Analyze the earnings call transcript of the company named at the end of these instructions.
+
+**CRITICAL OUTPUT CONSTRAINTS:**
+1.  **JSON ONLY:** You MUST return a single, valid JSON object following the response schema. No text, notes, or explanations before or after the JSON.
+2.  **STRICT CHARACTER LIMIT:** The final, stringified JSON output MUST be under **{TARGET_CHAR_LIMIT} characters**. This is a hard limit. Be extremely concise, adhering to the per-field limits below.
+3.  **STRINGS, NOT OBJECTS:** All values in the final JSON must be strings or lists of strings. **Do NOT use nested JSON objects.**
+4.  **RAW TEXT ONLY:** The string values you generate MUST be clean, raw text. **Do NOT include any Markdown formatting (like *, _, `), escape characters (like \\n, \\), or HTML tags.** The application will handle all formatting.
+
+**Analysis Instructions (JSON key in brackets; adhere to character limits):**
+1.  **Executive Summary ["es"] (Max 350 chars):** 2-3 sentences.
+2.  **Key Takeaway ["kt"] (Max 200 chars):** A single, high-conviction sentence.
+3.  **Key Financials ["kf"]:** A list of short strings (max 70 chars each), e.g. "Revenue: ₹X Crores (Up Y% QoQ)".
+4.  **Strategic Outlook ["so"]:** A list of short strings (max 100 chars each).
+5.  **Risks & Concerns ["rc"]:** A list of strings. **For each risk, format it as a single string: "Risk Description (Mitigation: Stated Mitigation Strategy)".**
+6.  **Management Tone ["mt"] (Max 150 chars):** A single string.
+7.  **Key Q&A Highlights ["qa"]:** A list of short strings (max 150 chars each), each as "Q: ... A: ...".
+8.  **Previous Call Comparison ["cmp"]:** See the instruction at the end.
+
+**Sentiment ["sentiment"] Options (choose ONE):**
+- Strongly Bullish | Moderately Bullish | Neutral | Cautious/Bearish | Strongly Bearish
+
+Set "type" to "summary".
+"""
+
+HISTORICAL_BATCH_PROMPT_PREFIX = f"""
+You are an expert financial analyst AI. Below are several historical earnings call transcripts, each introduced by a header of the form "=== DOC n (Company: name) ===". Summarize EACH document independently; these summaries will be used for comparison against future calls.
+
+**Instructions:**
+1.  **Focus on Key Outcomes:** For each document, extract the main financial results, strategic goals stated at the time, and any major risks discussed.
+2.  **Be Concise:** Each document's summary should be well under {TARGET_CHAR_LIMIT} characters.
+3.  **One Result Per Document:** Return a single JSON object whose "results" list holds exactly one object per document, in document order, with "doc" set to the document's number and "company_name" taken from its header. Never merge documents.
+4.  **Keys:** "es" is a 2-3 sentence summary of the call's key outcome, "kf" the key financial metrics, "so" the strategic goals and promises, "rc" the risks mentioned. Set "type" to "summary".
+"""
+
+# The per-call tail of each prompt is filled in from these templates.
+COMPANY_LINE_TEMPLATE = """
+**Company:** '{company_name}'. Use exactly this as the value of "company_name".
+"""
+STRUCTURED_SUFFIX_TEMPLATE = (
+    "\n{historical_comparison_instruction}\n" + COMPANY_LINE_TEMPLATE
+)
+NO_PREVIOUS_CALL_INSTRUCTION = '8.  **Previous Call Comparison ["cmp"]:** No previous call data was provided for comparison. State this explicitly as a string.'
+PREVIOUS_CALL_INSTRUCTION_TEMPLATE = """
+8.  **Previous Call Comparison ["cmp"] (Max 400 chars):** You have been provided with the JSON summary of the previous earnings call. Your primary task is to compare the CURRENT call to the PREVIOUS one. **The value for this key MUST be a single, well-formatted string, NOT a JSON object.** Summarize the comparison, addressing:
+    - Did management execute on their previously stated goals (from `strategic_outlook`)?
+    - How have the financials changed?
+    - Have previous risks been mitigated or have new ones emerged?
+    - Conclude if the company's position has improved, weakened, or remained stable.
+
+Here is the JSON from the previous call:
+```json
+{previous_summary_json}
+```"""
+PREVIOUS_INSTRUCTION_MEMO_SIZE = 256
+
+# Named after the prefix, so a prompt change never reuses a stale cache.
+CONTEXT_CACHE_NAME = (
+    "bse_summarizer_"
+    + hashlib.sha256(STRUCTURED_PROMPT_PREFIX.encode()).hexdigest()[:12]
+)
+
+
+async def _gemini_call_with_retry(
+    call_fn: Callable,
+    *,
+    desc="gemini_call",
+    max_attempts=3,
+    limiter: Optional[AsyncRateLimiter] = None,
+    adapter: Optional[TypeAdapter] = None,
+):
     """
     Universal retry wrapper for ANY Gemini API call (text or media).
-    call_fn()  ->  response object with .text attribute
+    call_fn(feedback)  ->  response object with .text attribute, where
+    feedback is a list of extra prompt parts to append (empty on the first
+    attempt; afterwards it explains why the last reply was rejected).
+    The reply must be raw JSON; with an adapter it is also validated against
+    the expected schema. The blocking SDK call runs in a worker thread, so
+    concurrent summaries overlap instead of holding up the event loop. Every
+    attempt takes a token from limiter, which paces calls to the API's
+    request rate; the exponential backoff with jitter applies only after a
+    failed attempt.
     """
+    feedback = []
     for attempt in range(1, max_attempts + 1):
-        # A small delay to avoid overwhelming the API
-
-        time.sleep(1 + attempt)
+        if limiter:
+            await limiter.acquire()
         try:
-            resp = call_fn()
+            resp = await asyncio.to_thread(call_fn, feedback)
 
             if not hasattr(resp, "text") or not resp.text or not resp.text.strip():
                 raise ValueError("Empty or invalid response object from Gemini API")
 
-            cleaned = (
-                resp.text.strip().removeprefix("```json").removesuffix("```").strip()
-            )
-            return json.loads(cleaned)
-        except (JSONDecodeError, ValueError) as exc:
+            if adapter:
+                return adapter.validate_json(resp.text).model_dump(exclude_unset=True)
+            return orjson.loads(resp.text)
+        except ValueError as exc:  # includes JSON decode and validation errors
             logger.warning(
                 f"⚠️  {desc} failed (attempt {attempt}/{max_attempts}): {exc}"
             )
             if attempt == max_attempts:
                 break
+            feedback = [RETRY_FEEDBACK.format(error=str(exc)[:RETRY_FEEDBACK_CHARS])]
             sleep_time = 2**attempt + random.uniform(0, 1)  # exp-backoff + jitter
             logger.info(f"Retrying in {sleep_time:.2f} seconds...")
-            time.sleep(sleep_time)
+            await asyncio.sleep(sleep_time)
         except Exception as exc:  # Catch-all so the main pipeline survives
             logger.exception(f"🔥 Unexpected fatal error in {desc}")
             break
@@ -57,137 +207,349 @@ def _gemini_call_with_retry(call_fn: Callable, *, desc="gemini_call", max_attemp
 
 
 class GeminiSummarizer:
-    def __init__(self):
+    def __init__(
+        self, session_factory: Optional[Callable[[], aiohttp.ClientSession]] = None
+    ):
+        """
+        session_factory returns the aiohttp session used for media downloads,
+        so a caller can share its own; without one the summarizer opens (and
+        close() closes) a session of its own.
+        """
         self.api_key = os.getenv("GEMINI_API_KEY")
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY not found in .env file.")
 
         genai.configure(api_key=self.api_key)
 
-        self.model = genai.GenerativeModel("gemini-flash-latest")
-        logger.info(f"🧠 GeminiSummarizer initialized with model: gemini-flash-latest")
+        self.model = genai.GenerativeModel(MODEL_NAME)
+        logger.info(f"🧠 GeminiSummarizer initialized with model: {MODEL_NAME}")
 
         self.media_cache_path = Path("media_cache")
         self.media_cache_path.mkdir(exist_ok=True)
 
-    def _extract_company_name_from_text(self, text: str) -> str:
-        """Fallback to extract company name if it's missing."""
+        # Bounds the Gemini requests that the scraper's concurrent items issue.
+        self._llm_semaphore = asyncio.Semaphore(MAX_CONCURRENT_LLM)
+        self._download_semaphore = asyncio.Semaphore(MAX_CONCURRENT_MEDIA_DOWNLOADS)
+        self._upload_semaphore = asyncio.Semaphore(MAX_CONCURRENT_MEDIA_UPLOADS)
+        # Paces them to the API quota, shared by every call and retry.
+        self._llm_limiter = AsyncRateLimiter(
+            int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", GEMINI_REQUESTS_PER_MINUTE)),
+            60.0,
+        )
+
+        self._session_factory = session_factory
+        self._own_session: Optional[aiohttp.ClientSession] = None
+
+        self.cache_dir = LLM_CACHE_DIR
+        self.cache_dir.mkdir(exist_ok=True)
+        self._prune_cache()
+        # One lock per cache key, so concurrent identical requests make one call.
+        # A lock is dropped once no caller holds or awaits it.
+        self._cache_locks: Dict[str, asyncio.Lock] = {}
+        self._cache_lock_users: Dict[str, int] = {}
+        # Company names extracted this session, by text hash, in front of
+        # their llm_cache entries.
+        self._company_names: Dict[str, str] = {}
+        # id(previous_summary) -> (previous_summary, formatted instruction 8).
+        self._prev_instructions: Dict[int, Tuple[dict, str]] = {}
+        # Running summarize() calls by request key, for in-flight dedup.
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        self._use_context_cache = os.getenv("GEMINI_CONTEXT_CACHE") == "1"
+        self._context_cache_lock = asyncio.Lock()
+        self._cached_model = None
+
+        self._batch_pending: list = []
+        # Historical text summaries under way, batched or not.
+        self._historical_active = 0
+        self._batch_timer: Optional[asyncio.TimerHandle] = None
+        self._batch_tasks: set = set()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Returns the injected session, or a session of our own created on first use."""
+        if self._session_factory:
+            return self._session_factory()
+        if self._own_session is None or self._own_session.closed:
+            self._own_session = aiohttp.ClientSession()
+        return self._own_session
+
+    async def close(self):
+        """Closes the summarizer's own HTTP session; an injected one is left to its owner."""
+        if self._own_session and not self._own_session.closed:
+            await self._own_session.close()
+
+    @staticmethod
+    def _cache_key(
+        prompt: str, content: str, previous_summary: Optional[Dict] = None
+    ) -> str:
+        """The cache key of a summary request: a SHA-256 over everything that shapes the answer."""
+        content_hash = hashlib.sha256(content.encode()).hexdigest()
+        return hashlib.sha256(
+            orjson.dumps(
+                [prompt, content_hash, MODEL_NAME, previous_summary],
+                option=orjson.OPT_SORT_KEYS,
+            )
+        ).hexdigest()
+
+    def _prune_cache(self):
+        """Drops the least recently used cache files beyond LLM_CACHE_MAX_ENTRIES."""
+        entries = list(self.cache_dir.glob("*.json"))
+        if len(entries) <= LLM_CACHE_MAX_ENTRIES:
+            return
+        entries.sort(key=lambda p: p.stat().st_mtime)
+        for path in entries[: len(entries) - LLM_CACHE_MAX_ENTRIES]:
+            path.unlink(missing_ok=True)
+
+    def _read_cache(self, key: str) -> Optional[dict]:
+        cache_file = self.cache_dir / f"{key}.json"
+        try:
+            summary = orjson.loads(cache_file.read_bytes())
+        except FileNotFoundError:
+            return None
+        except orjson.JSONDecodeError:
+            logger.warning(f"⚠️ Ignoring unreadable LLM cache entry {cache_file.name}")
+            return None
+        # Touch the file so pruning keeps recently used entries.
+        os.utime(cache_file)
+        return summary
+
+    def _write_cache(self, key: str, summary: dict):
+        """Writes a cache entry atomically: to a temp file first, then renamed into place."""
+        cache_file = self.cache_dir / f"{key}.json"
+        tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            tmp_file.write_bytes(orjson.dumps(summary))
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not write LLM cache entry {cache_file.name}: {e}")
+            tmp_file.unlink(missing_ok=True)
+
+    async def _cached_summary(
+        self, key: str, produce: Callable[[], Awaitable[Optional[dict]]]
+    ) -> Optional[dict]:
+        """
+        Returns the cached response for key, or awaits produce() and caches
+        its result. Failed calls (None) are not cached.
+        """
+        lock = self._cache_locks.setdefault(key, asyncio.Lock())
+        # lock.locked() turns False on release before a waiter has taken the
+        # lock, so the users count (holder plus waiters) decides its removal.
+        self._cache_lock_users[key] = self._cache_lock_users.get(key, 0) + 1
+        try:
+            async with lock:
+                summary = self._read_cache(key)
+                if summary is not None:
+                    logger.info(f"♻️ LLM cache hit ({key[:12]})")
+                    return summary
+                summary = await produce()
+                if summary is not None:
+                    self._write_cache(key, summary)
+                return summary
+        finally:
+            self._cache_lock_users[key] -= 1
+            if not self._cache_lock_users[key]:
+                del self._cache_lock_users[key]
+                del self._cache_locks[key]
+
+    async def _generate(
+        self, model, parts: list, output: OutputFormat, desc: str
+    ) -> Optional[dict]:
+        """
+        Asks model for a JSON reply of the given output format, through the
+        retry wrapper and under the concurrency limit.
+        """
+
+        def _call(feedback):
+            return model.generate_content(
+                [*parts, *feedback], generation_config=output.generation_config
+            )
+
+        async with self._llm_semaphore:
+            return await _gemini_call_with_retry(
+                _call, desc=desc, limiter=self._llm_limiter, adapter=output.adapter
+            )
+
+    async def _extract_company_name_from_text(self, text: str) -> str:
+        """
+        Fallback to extract company name if it's missing. Transcripts that
+        open with the usual "Earnings Conference Call of <Name> Limited"
+        boilerplate are read with a regex; otherwise Gemini is asked, and
+        its answer is cached by a hash of the text it was shown.
+        """
+        head = text[:COMPANY_NAME_TEXT_CHARS]
+        if match := COMPANY_NAME_PATTERN.search(head):
+            return " ".join(match.group(1).split())
+
+        key = "company-" + hashlib.sha1(head.encode()).hexdigest()
+        if key in self._company_names:
+            return self._company_names[key]
+        cached = self._read_cache(key)
+        if cached is not None:
+            self._company_names[key] = cached["company_name"]
+            return cached["company_name"]
+
         prompt = """
         You are a financial document analyst. Extract the primary **company name** from the following text.
         Return ONLY the company name as a plain string. If unsure, return "Unknown Company".
         """
         try:
-            resp = self.model.generate_content([prompt + "\n\n" + text[:4000]])
-            return resp.text.strip() or "Unknown Company"
+            async with self._llm_semaphore:
+                await self._llm_limiter.acquire()
+                resp = await asyncio.to_thread(
+                    self.model.generate_content, [prompt + "\n\n" + head]
+                )
+            company_name = resp.text.strip() or "Unknown Company"
         except Exception as e:
             logger.warning(f"⚠️ Failed to extract company name via AI: {e}")
             return "Unknown Company"
+        self._company_names[key] = company_name
+        self._write_cache(key, {"company_name": company_name})
+        return company_name
 
-    def _generate_historical_summary_prompt(self, company_name: str) -> str:
-        """Generates a prompt to create a concise summary of a historical document."""
-        return f"""
-You are an expert financial analyst AI. Your task is to create a concise summary of the provided historical earnings call transcript for '{company_name}'. This summary will be used for comparison against a future call.
-
-**Instructions:**
-1.  **Focus on Key Outcomes:** Extract the main financial results, strategic goals stated at the time, and any major risks discussed.
-2.  **Be Concise:** The entire output must be a single, valid JSON object and should be well under {TARGET_CHAR_LIMIT} characters.
-
-**Output Format (Strict JSON):**
-{{
-    "company_name": "{company_name}",
-    "type": "summary",
-    "executive_summary": "A 2-3 sentence summary of the call's key outcome.",
-    "key_financials": ["Metric 1", "Metric 2"],
-    "strategic_outlook": ["Goal 1", "Promise 2"],
-    "risks_and_concerns": ["Risk 1 mentioned"]
-}}
-"""
+    def _historical_prompt_suffix(self, company_name: str) -> str:
+        """The per-call tail of the historical summary prompt."""
+        return COMPANY_LINE_TEMPLATE.format(company_name=company_name)
 
-    def _generate_structured_prompt(
+    def _previous_call_instruction(self, previous_summary: Dict) -> str:
+        """
+        Instruction 8 with the previous call's JSON. Memoized by object
+        identity (checked, since ids can be reused): the scraper hands the
+        same previous summary to every item of a company and date.
+        """
+        entry = self._prev_instructions.get(id(previous_summary))
+        if entry and entry[0] is previous_summary:
+            return entry[1]
+        instruction = PREVIOUS_CALL_INSTRUCTION_TEMPLATE.format(
+            previous_summary_json=orjson.dumps(
+                previous_summary, option=orjson.OPT_INDENT_2
+            ).decode()
+        )
+        if len(self._prev_instructions) >= PREVIOUS_INSTRUCTION_MEMO_SIZE:
+            self._prev_instructions.clear()
+        self._prev_instructions[id(previous_summary)] = (previous_summary, instruction)
+        return instruction
+
+    def _structured_prompt_suffix(
         self, company_name: str, previous_summary: Optional[Dict] = None
     ) -> str:
-
-        TARGET_CHAR_LIMIT = 2800
-
-        if previous_summary:
-            previous_summary_str = json.dumps(previous_summary, indent=2)
-            historical_comparison_instruction = f"""
-8.  **Previous Call Comparison (Max 400 chars):** You have been provided with the JSON summary of the previous earnings call. Your primary task is to compare the CURRENT call to the PREVIOUS one. **The value for this key MUST be a single, well-formatted string, NOT a JSON object.** Summarize the comparison, addressing:
-    - Did management execute on their previously stated goals (from `strategic_outlook`)?
-    - How have the financials changed?
-    - Have previous risks been mitigated or have new ones emerged?
-    - Conclude if the company's position has improved, weakened, or remained stable.
-
-Here is the JSON from the previous call:
-```json
-{previous_summary_str}
-```"""
-        else:
-            historical_comparison_instruction = "8.  **Previous Call Comparison:** No previous call data was provided for comparison. State this explicitly as a string."
-
-        return f"""
-You are an expert financial analyst AI. Your analysis is concise, data-driven, and rivals a seasoned human analyst. Analyze the earnings call transcript for '{company_name}'.
-
-**CRITICAL OUTPUT CONSTRAINTS:**
-1.  **JSON ONLY:** You MUST return a single, valid JSON object. No text, notes, or explanations before or after the JSON.
-2.  **STRICT CHARACTER LIMIT:** The final, stringified JSON output MUST be under **{TARGET_CHAR_LIMIT} characters**. This is a hard limit. Be extremely concise, adhering to the per-field limits below.
-3.  **STRINGS, NOT OBJECTS:** All values in the final JSON must be strings or lists of strings. **Do NOT use nested JSON objects.**
-4.  **RAW TEXT ONLY:** The string values you generate MUST be clean, raw text. **Do NOT include any Markdown formatting (like *, _, `), escape characters (like \\n, \\), or HTML tags.** The application will handle all formatting.
-
-**Analysis Instructions (Adhere to character limits):**
-1.  **Executive Summary (Max 350 chars):** 2-3 sentences.
-2.  **Key Takeaway (Max 200 chars):** A single, high-conviction sentence.
-3.  **Key Financials:** A list of short strings (max 70 chars each).
-4.  **Strategic Outlook:** A list of short strings (max 100 chars each).
-5.  **Risks & Concerns:** A list of strings. **For each risk, format it as a single string: "Risk Description (Mitigation: Stated Mitigation Strategy)".**
-6.  **Management Tone (Max 150 chars):** A single string.
-7.  **Key Q&A Highlights:** A list of short strings (max 150 chars each).
-{historical_comparison_instruction}
-
-**Sentiment Options (choose ONE):**
-- Strongly Bullish | Moderately Bullish | Neutral | Cautious/Bearish | Strongly Bearish
-
-**Output Format (Example with STRICT formatting):**
-{{
-    "company_name": "{company_name}",
-    "type": "summary",
-    "executive_summary": "Share India delivered robust sequential results driven by MTF expansion and secured Board approval for $50 million in FCCBs to fuel future growth and lower capital costs.",
-    "key_takeaway": "The primary takeaway is that management has successfully de-risked its aggressive MTF growth strategy via the strategic $50M FCCB approval, securing its main profit engine.",
-    "sentiment": "Strongly Bullish",
-    "management_tone": "Overwhelmingly confident and bullish, backed by strong execution on their MTF targets and a proactive approach to financing (FCCB approval).",
-    "key_financials": [
-        "Revenue: ₹X Crores (Up Y% QoQ)",
-        "PAT: ₹Z Crores (Up A% QoQ)",
-        "PAT Margin improved to 27%.",
-        "Declared dividend of ₹2 per share."
-    ],
-    "strategic_outlook": [
-        "Accelerating Credit (MTF) with a target of INR 1,000 Crores by Dec 2027.",
-        "Entering Wealth Management (PMS/AIF) as a major diversification."
-    ],
-    "risks_and_concerns": [
-        "Competitive Yield Compression in the MTF business (Mitigation: Planned $50M FCCB issuance to lower the cost of capital).",
-        "New Venture Integration and Execution Risk for the PMS/AIF and Debt Capital verticals (Mitigation: Hiring specialized teams)."
-    ],
-    "key_qa_highlights": [
-        "Q: How will you compete on MTF yields? A: The FCCB will lower our cost of funds, allowing us to remain competitive while protecting margins."
-    ],
-    "comparison_with_previous_call": "The company's position has significantly improved. Management successfully executed on their promise to grow the MTF book and directly addressed the previous 'Capital Deployment Risk' by securing the FCCB approval. The new risk of yield compression is already being actively mitigated."
-}}
-"""
-
-    async def _summarize_media_from_url(
+        """The per-call tail of the structured prompt: the company and instruction 8."""
+        return STRUCTURED_SUFFIX_TEMPLATE.format(
+            historical_comparison_instruction=(
+                self._previous_call_instruction(previous_summary)
+                if previous_summary
+                else NO_PREVIOUS_CALL_INSTRUCTION
+            ),
+            company_name=company_name,
+        )
+
+    def _build_prompt(
         self,
-        media_url: str,
         company_name: str,
-        original_pdf_url: str,
         previous_summary: Optional[Dict] = None,
         is_historical_jit: bool = False,
-        desc_prefix: str = "",
-    ) -> dict:
-        """Downloads, processes, and summarizes a media file using the appropriate prompt."""
+    ) -> Tuple[str, str]:
+        """Returns the (static prefix, per-call suffix) of the prompt for a request."""
+        if is_historical_jit:
+            return HISTORICAL_PROMPT_PREFIX, self._historical_prompt_suffix(
+                company_name
+            )
+        return STRUCTURED_PROMPT_PREFIX, self._structured_prompt_suffix(
+            company_name, previous_summary
+        )
+
+    def _find_or_create_context_cache(self):
+        """
+        Returns a live CachedContent holding STRUCTURED_PROMPT_PREFIX, reusing
+        one an earlier run created when it is still valid. Blocking; run it in
+        a thread.
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for cache in genai.caching.CachedContent.list():
+            if (
+                cache.display_name == CONTEXT_CACHE_NAME
+                and cache.expire_time - now > CONTEXT_CACHE_MIN_REMAINING
+            ):
+                return cache
+        return genai.caching.CachedContent.create(
+            model=MODEL_NAME,
+            contents=[STRUCTURED_PROMPT_PREFIX],
+            ttl=CONTEXT_CACHE_TTL,
+            display_name=CONTEXT_CACHE_NAME,
+        )
+
+    async def _model_and_parts(self, prefix: str, suffix: str) -> Tuple[Any, list]:
+        """
+        Returns the model to call and the prompt parts to send ahead of the
+        content. With an explicit context cache the static prefix is already
+        on the server, so only the suffix is sent; otherwise the whole prompt
+        goes first and implicit caching reuses the shared prefix.
+        """
+        if self._use_context_cache and prefix is STRUCTURED_PROMPT_PREFIX:
+            async with self._context_cache_lock:
+                if self._cached_model is None and self._use_context_cache:
+                    try:
+                        cache = await asyncio.to_thread(
+                            self._find_or_create_context_cache
+                        )
+                        self._cached_model = genai.GenerativeModel.from_cached_content(
+                            cached_content=cache
+                        )
+                        logger.info(f"🧠 Using Gemini context cache '{cache.name}'")
+                    except Exception as e:
+                        logger.warning(
+                            f"⚠️ Gemini context cache unavailable, sending full prompts: {e}"
+                        )
+                        self._use_context_cache = False
+            if self._cached_model is not None:
+                return self._cached_model, [suffix]
+        return self.model, [prefix + suffix]
+
+    async def _download_media(self, media_url: str, filepath: Path):
+        """Stage 1: streams a media file to disk."""
+        async with self._download_semaphore:
+            async with self._get_session().get(
+                media_url,
+                timeout=aiohttp.ClientTimeout(total=120),
+                ssl=False,
+                raise_for_status=True,
+            ) as response:
+                with open(filepath, "wb", buffering=MEDIA_DOWNLOAD_CHUNK_SIZE) as f:
+                    async for chunk in response.content.iter_chunked(
+                        MEDIA_DOWNLOAD_CHUNK_SIZE
+                    ):
+                        f.write(chunk)
+
+    async def _upload_media(self, filepath: Path, on_uploaded: Callable):
+        """
+        Stage 2: uploads a file to Gemini and waits until it is ACTIVE.
+        on_uploaded receives the file as soon as it exists remotely, so the
+        caller can delete it even if processing fails.
+        """
+        async with self._upload_semaphore:
+            media_file = await asyncio.to_thread(genai.upload_file, path=filepath)
+        on_uploaded(media_file)
+        # Polling holds no slot: it costs nothing while Gemini does the work.
+        while media_file.state.name == "PROCESSING":
+            await asyncio.sleep(MEDIA_POLL_SECONDS)
+            media_file = await asyncio.to_thread(genai.get_file, name=media_file.name)
+        if media_file.state.name == "FAILED":
+            raise Exception(f"Gemini file processing failed: {media_file.state}")
+        return media_file
+
+    async def _media_summary_json(
+        self,
+        media_url: str,
+        prefix: str,
+        suffix: str,
+        output: OutputFormat,
+        desc: str,
+    ) -> Optional[dict]:
+        """
+        Downloads a media file, uploads it to Gemini and returns the parsed
+        summary, deleting the temp file and the uploaded file afterwards.
+        """
         filepath = None
-        media_file = None
+        uploaded = []
         try:
             logger.info(f"⬇️ Downloading media for summarization from {media_url}")
             random_suffix = "".join(
@@ -202,37 +564,175 @@ You are an expert financial analyst AI. Your analysis is concise, data-driven, a
                 logger.info(f"📎 Using local test file: {filepath}")
             else:
                 filepath = self.media_cache_path / filename
-                response = requests.get(
-                    media_url, timeout=120, stream=True, verify=False
-                )
-                response.raise_for_status()
-                with open(filepath, "wb") as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
+                await self._download_media(media_url, filepath)
 
             logger.info(f"🧠 Uploading '{filename}' to Gemini...")
-            media_file = genai.upload_file(path=filepath)
-            while media_file.state.name == "PROCESSING":
-                time.sleep(2)
-                media_file = genai.get_file(name=media_file.name)
-            if media_file.state.name == "FAILED":
-                raise Exception(f"Gemini file processing failed: {media_file.state}")
+            media_file = await self._upload_media(filepath, uploaded.append)
+
+            # Stage 3: generation, bounded by the LLM semaphore in _generate.
+            model, parts = await self._model_and_parts(prefix, suffix)
+            return await self._generate(model, [*parts, media_file], output, desc)
+        finally:
+            if filepath and filepath.exists() and not media_url.startswith("file://"):
+                try:
+                    filepath.unlink()
+                except OSError as e:
+                    logger.warning(f"Could not delete temp media file {filepath}: {e}")
+            for media_file in uploaded:
+                try:
+                    await asyncio.to_thread(genai.delete_file, name=media_file.name)
+                except Exception as e:
+                    logger.warning(
+                        f"Could not delete Gemini file {media_file.name}: {e}"
+                    )
 
+    def _pack_batches(self, entries: list) -> list:
+        """
+        Greedily groups (index, key, content, company_name) entries into
+        batches of at most HISTORICAL_BATCH_SIZE documents whose combined
+        text stays within MAX_BATCH_PROMPT_CHARS. A document larger than the
+        budget goes in a batch of its own.
+        """
+        batches, current, current_chars = [], [], 0
+        for entry in entries:
+            chars = len(entry[2])
+            if current and (
+                len(current) >= HISTORICAL_BATCH_SIZE
+                or current_chars + chars > MAX_BATCH_PROMPT_CHARS
+            ):
+                batches.append(current)
+                current, current_chars = [], 0
+            current.append(entry)
+            current_chars += chars
+        if current:
+            batches.append(current)
+        return batches
+
+    async def summarize_batch(
+        self, items: List[Tuple[dict, str]]
+    ) -> List[Optional[dict]]:
+        """
+        Generates historical (comparison) summaries for many text documents,
+        given as (content_data, company_name) pairs, with one Gemini request
+        per packed batch instead of one per document. Returns the summaries
+        in input order; an entry is None when the model left that document
+        out or returned something unusable, so the caller can retry it alone.
+        Summaries are read from and written to the same cache as summarize().
+        """
+        results: List[Optional[dict]] = [None] * len(items)
+        misses = []
+        for index, (content_data, company_name) in enumerate(items):
+            prefix, suffix = self._build_prompt(company_name, is_historical_jit=True)
+            key = self._cache_key(prefix + suffix, content_data["content"])
+            cached = self._read_cache(key)
+            if cached is not None:
+                results[index] = cached
+            else:
+                misses.append((index, key, content_data["content"], company_name))
+
+        for batch in self._pack_batches(misses):
+            documents = "\n\n".join(
+                f"=== DOC {n} (Company: {company_name}) ===\n{content}"
+                for n, (_, _, content, company_name) in enumerate(batch, start=1)
+            )
             logger.info(
-                f"🗣️ {desc_prefix}Generating structured summary from media for '{company_name}'..."
+                f"🧠 [JIT] Sending {len(batch)} historical transcripts to Gemini in one request..."
             )
-            if is_historical_jit:
-                prompt = self._generate_historical_summary_prompt(company_name)
-            else:
-                prompt = self._generate_structured_prompt(
-                    company_name, previous_summary
-                )
+            parsed = await self._generate(
+                self.model,
+                [HISTORICAL_BATCH_PROMPT_PREFIX, documents],
+                HISTORICAL_BATCH_OUTPUT,
+                desc=f"[JIT] batch summary of {len(batch)} documents",
+            )
+            docs = parsed.get("results") if isinstance(parsed, dict) else None
+            if not isinstance(docs, list):
+                continue
+            by_number = {
+                doc.pop("doc", None): doc for doc in docs if isinstance(doc, dict)
+            }
+            for n, (index, key, _, company_name) in enumerate(batch, start=1):
+                doc = by_number.get(n)
+                if doc and doc.get("type") == "summary":
+                    doc["company_name"] = company_name
+                    self._write_cache(key, doc)
+                    results[index] = doc
+        return results
+
+    async def _batched_historical_summary(
+        self, content_data: dict, company_name: str
+    ) -> Optional[dict]:
+        """
+        Queues a historical text summary to be sent together with the others
+        requested within HISTORICAL_BATCH_WAIT_SECONDS (or until a batch is
+        full). Returns None when the document should be summarized on its own,
+        straight away if no other historical summary is under way or queued.
+        """
+        # The caller counts itself in _historical_active.
+        if not self._batch_pending and self._historical_active <= 1:
+            return None
+        future = asyncio.get_running_loop().create_future()
+        self._batch_pending.append((content_data, company_name, future))
+        if len(self._batch_pending) >= HISTORICAL_BATCH_SIZE:
+            self._flush_historical_batch()
+        elif self._batch_timer is None:
+            self._batch_timer = asyncio.get_running_loop().call_later(
+                HISTORICAL_BATCH_WAIT_SECONDS, self._flush_historical_batch
+            )
+        return await future
+
+    def _flush_historical_batch(self):
+        if self._batch_timer:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+        pending, self._batch_pending = self._batch_pending, []
+        if len(pending) == 1:
+            # Nothing to batch with; the single-document prompt does better.
+            pending[0][2].set_result(None)
+            return
+        task = asyncio.ensure_future(self._run_historical_batch(pending))
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_historical_batch(self, pending: list):
+        try:
+            results = await self.summarize_batch(
+                [(content_data, company_name) for content_data, company_name, _ in pending]
+            )
+        except Exception as e:
+            logger.error(f"❌ [JIT] Batch summarization failed: {e}", exc_info=True)
+            results = [None] * len(pending)
+        for (_, _, future), result in zip(pending, results):
+            if not future.done():
+                future.set_result(result)
 
-            def _call():
-                return self.model.generate_content([prompt, media_file])
+    async def _summarize_media_from_url(
+        self,
+        media_url: str,
+        company_name: str,
+        original_pdf_url: str,
+        previous_summary: Optional[Dict] = None,
+        is_historical_jit: bool = False,
+        desc_prefix: str = "",
+    ) -> dict:
+        """Downloads, processes, and summarizes a media file using the appropriate prompt."""
+        try:
+            prefix, suffix = self._build_prompt(
+                company_name, previous_summary, is_historical_jit
+            )
 
-            summary_json = _gemini_call_with_retry(
-                _call, desc=f"{desc_prefix}media summary for {company_name}"
+            logger.info(
+                f"🗣️ {desc_prefix}Generating structured summary from media for '{company_name}'..."
+            )
+            # Keyed by URL, so a cache hit skips the download and upload too.
+            summary_json = await self._cached_summary(
+                self._cache_key(prefix + suffix, media_url, previous_summary),
+                lambda: self._media_summary_json(
+                    media_url,
+                    prefix,
+                    suffix,
+                    HISTORICAL_OUTPUT if is_historical_jit else STRUCTURED_OUTPUT,
+                    f"{desc_prefix}media summary for {company_name}",
+                ),
             )
 
             if summary_json is None:
@@ -260,19 +760,6 @@ You are an expert financial analyst AI. Your analysis is concise, data-driven, a
             )
             error_json["links"] = [{"url": media_url, "link_type": "media"}]
             return error_json
-        finally:
-            if filepath and filepath.exists() and not media_url.startswith("file://"):
-                try:
-                    filepath.unlink()
-                except OSError as e:
-                    logger.warning(f"Could not delete temp media file {filepath}: {e}")
-            if media_file:
-                try:
-                    genai.delete_file(name=media_file.name)
-                except Exception as e:
-                    logger.warning(
-                        f"Could not delete Gemini file {media_file.name}: {e}"
-                    )
 
     async def summarize(
         self,
@@ -286,14 +773,55 @@ You are an expert financial analyst AI. Your analysis is concise, data-driven, a
         Orchestrates summarization for both new and historical (JIT) content.
         - If is_historical_jit is True, it generates a simpler summary for comparison purposes.
         - It correctly handles text, media links, and web links for both cases.
+        - Identical calls made while one is in flight share its work; each
+          caller gets its own copy of the result.
         """
+        key = hashlib.sha256(
+            orjson.dumps(
+                [
+                    content_data,
+                    company_name,
+                    original_pdf_url,
+                    previous_summary,
+                    is_historical_jit,
+                ],
+                option=orjson.OPT_SORT_KEYS,
+            )
+        ).hexdigest()
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(
+                self._summarize(
+                    content_data,
+                    company_name,
+                    original_pdf_url,
+                    previous_summary,
+                    is_historical_jit,
+                )
+            )
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            logger.info(f"♻️ Joining in-flight summary for '{company_name}'")
+        # Shielded, so a cancelled caller never cancels the shared call. The
+        # future's result stays private; callers mutate their copies.
+        return copy.deepcopy(await asyncio.shield(future))
+
+    async def _summarize(
+        self,
+        content_data: dict,
+        company_name: str,
+        original_pdf_url: str,
+        previous_summary: Optional[Dict],
+        is_historical_jit: bool,
+    ) -> dict:
         if not company_name or company_name.strip().lower() in [
             "n/a",
             "unknown",
             "unknown company",
         ]:
             logger.info("Company name is missing, attempting to extract from text...")
-            company_name = self._extract_company_name_from_text(
+            company_name = await self._extract_company_name_from_text(
                 content_data.get("content", "")
             )
             logger.info(f"Extracted company name: '{company_name}'")
@@ -303,23 +831,41 @@ You are an expert financial analyst AI. Your analysis is concise, data-driven, a
         desc_prefix = "[JIT] " if is_historical_jit else ""
 
         if content_type == "text":
-            if is_historical_jit:
-                prompt = self._generate_historical_summary_prompt(company_name)
-            else:
-                prompt = self._generate_structured_prompt(
-                    company_name, previous_summary
-                )
+            prefix, suffix = self._build_prompt(
+                company_name, previous_summary, is_historical_jit
+            )
 
             logger.info(
                 f"🧠 {log_prefix}Sending text for '{company_name}' to Gemini for structured analysis..."
             )
 
-            def _call():
-                return self.model.generate_content([prompt, content_data["content"]])
+            async def _produce():
+                model, parts = await self._model_and_parts(prefix, suffix)
+                return await self._generate(
+                    model,
+                    [*parts, content_data["content"]],
+                    HISTORICAL_OUTPUT if is_historical_jit else STRUCTURED_OUTPUT,
+                    desc=f"{desc_prefix}text summary for {company_name}",
+                )
 
-            summary_json = _gemini_call_with_retry(
-                _call, desc=f"{desc_prefix}text summary for {company_name}"
-            )
+            summary_json = None
+            if is_historical_jit:
+                self._historical_active += 1
+            try:
+                if is_historical_jit:
+                    summary_json = await self._batched_historical_summary(
+                        content_data, company_name
+                    )
+                if summary_json is None:
+                    summary_json = await self._cached_summary(
+                        self._cache_key(
+                            prefix + suffix, content_data["content"], previous_summary
+                        ),
+                        _produce,
+                    )
+            finally:
+                if is_historical_jit:
+                    self._historical_active -= 1
 
             if summary_json is None:
                 return self._create_error_json(
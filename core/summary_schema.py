@@ -0,0 +1,153 @@
+# core/summary_schema.py
+from typing import Any, Dict, Literal, NamedTuple
+
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, TypeAdapter
+
+# Gemini writes these fields under short keys to save output tokens; the
+# models below accept either spelling and always dump the long names, so
+# everything downstream (DB, notifier, comparisons) sees the usual JSON.
+COMPACT_KEYS = {
+    "executive_summary": "es",
+    "key_takeaway": "kt",
+    "key_financials": "kf",
+    "strategic_outlook": "so",
+    "risks_and_concerns": "rc",
+    "key_qa_highlights": "qa",
+    "management_tone": "mt",
+    "comparison_with_previous_call": "cmp",
+}
+
+
+def _compact(name: str, default: Any = ...) -> Any:
+    return Field(default, validation_alias=AliasChoices(COMPACT_KEYS[name], name))
+
+
+class HistoricalSummary(BaseModel):
+    """The compact summary of a previous call, kept for later comparison."""
+
+    model_config = ConfigDict(extra="allow")
+
+    company_name: str
+    type: Literal["summary"]
+    executive_summary: str = _compact("executive_summary")
+    key_financials: list[str] = _compact("key_financials", [])
+    strategic_outlook: list[str] = _compact("strategic_outlook", [])
+    risks_and_concerns: list[str] = _compact("risks_and_concerns", [])
+
+
+class StructuredSummary(HistoricalSummary):
+    """The full analysis of a new earnings call transcript."""
+
+    key_takeaway: str = _compact("key_takeaway", "")
+    sentiment: str = ""
+    management_tone: str = _compact("management_tone", "")
+    key_qa_highlights: list[str] = _compact("key_qa_highlights", [])
+    comparison_with_previous_call: str = _compact("comparison_with_previous_call", "")
+
+
+class HistoricalBatchEntry(HistoricalSummary):
+    doc: int
+
+
+class HistoricalBatch(BaseModel):
+    results: list[HistoricalBatchEntry]
+
+
+SENTIMENTS = [
+    "Strongly Bullish",
+    "Moderately Bullish",
+    "Neutral",
+    "Cautious/Bearish",
+    "Strongly Bearish",
+]
+
+# Gemini's response_schema takes the OpenAPI subset below, not pydantic
+# models with defaults, so the wire schemas are spelled out alongside them.
+# The descriptions tell the model what each short key holds.
+_STRING = {"type": "string"}
+_STRING_LIST = {"type": "array", "items": _STRING}
+
+
+def _described(schema: dict, description: str) -> dict:
+    return {**schema, "description": description}
+
+
+_HISTORICAL_PROPERTIES = {
+    "company_name": _STRING,
+    "type": {"type": "string", "enum": ["summary"]},
+    "es": _described(_STRING, "Executive summary"),
+    "kf": _described(_STRING_LIST, "Key financials"),
+    "so": _described(_STRING_LIST, "Strategic outlook"),
+    "rc": _described(_STRING_LIST, "Risks and concerns"),
+}
+_HISTORICAL_REQUIRED = ["company_name", "type", "es"]
+
+HISTORICAL_SUMMARY_SCHEMA = {
+    "type": "object",
+    "properties": _HISTORICAL_PROPERTIES,
+    "required": _HISTORICAL_REQUIRED,
+}
+
+STRUCTURED_SUMMARY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        **_HISTORICAL_PROPERTIES,
+        "kt": _described(_STRING, "Key takeaway"),
+        "sentiment": {"type": "string", "enum": SENTIMENTS},
+        "mt": _described(_STRING, "Management tone"),
+        "qa": _described(_STRING_LIST, "Key Q&A highlights"),
+        "cmp": _described(_STRING, "Comparison with previous call"),
+    },
+    "required": [
+        *_HISTORICAL_REQUIRED,
+        "kt",
+        "sentiment",
+        "mt",
+        "kf",
+        "so",
+        "rc",
+        "qa",
+        "cmp",
+    ],
+}
+
+HISTORICAL_BATCH_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "results": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"doc": {"type": "integer"}, **_HISTORICAL_PROPERTIES},
+                "required": ["doc", *_HISTORICAL_REQUIRED],
+            },
+        }
+    },
+    "required": ["results"],
+}
+
+# Low temperature keeps the analysis terse and the JSON on-schema.
+SUMMARY_TEMPERATURE = 0.2
+
+
+class OutputFormat(NamedTuple):
+    """How to ask Gemini for one response shape and how to validate the reply."""
+
+    generation_config: Dict[str, Any]
+    adapter: TypeAdapter
+
+
+def _json_output(schema: dict, model: type) -> OutputFormat:
+    return OutputFormat(
+        {
+            "response_mime_type": "application/json",
+            "response_schema": schema,
+            "temperature": SUMMARY_TEMPERATURE,
+        },
+        TypeAdapter(model),
+    )
+
+
+STRUCTURED_OUTPUT = _json_output(STRUCTURED_SUMMARY_SCHEMA, StructuredSummary)
+HISTORICAL_OUTPUT = _json_output(HISTORICAL_SUMMARY_SCHEMA, HistoricalSummary)
+HISTORICAL_BATCH_OUTPUT = _json_output(HISTORICAL_BATCH_SCHEMA, HistoricalBatch)
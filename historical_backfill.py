@@ -1,16 +1,21 @@
 # historical_backfill.py
 
 import asyncio
+import io
 import logging
 import sqlite3
-import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from dateutil.relativedelta import relativedelta
-import requests
 from lxml import etree
 import aiohttp
-from asyncio import Queue, Event
+import orjson
+from asyncio import Queue
+
+from core.db_handler import SQLITE_PRAGMAS
+from core.historical_db_handler import bulk_insert_announcements
+from init_historical_db import initialize_database
+from core.rate_limiter import AsyncRateLimiter, CircuitBreaker
 
 # --- Configuration ---
 HISTORICAL_DB = "historical_announcements.db"
@@ -19,7 +24,19 @@ LOG_DIR.mkdir(parents=True, exist_ok=True)
 MONTHS_TO_BACKFILL = 24
 # --- Concurrency Control ---
 MAX_CONCURRENT_WORKERS = 3 
+# Announcement list pages fetched at once, and started per second.
+MAX_CONCURRENT_PAGES = 4
+LIST_PAGES_PER_SECOND = 4
+# XBRL requests started per second, across all workers.
+XBRL_REQUESTS_PER_SECOND = 5
+# Consecutive server failures (HTML error pages, 5xx, 429) that pause every
+# worker, and the first pause in seconds (doubling while failures persist).
+FAILURE_THRESHOLD = 5
 THROTTLE_SECONDS = 5.0  
+# Inserts are committed in batches of up to this many rows, waiting at most
+# this long for a batch to fill.
+WRITE_BATCH_SIZE = 500
+WRITE_BATCH_SECONDS = 1.0
 
 # --- Logging Setup ---
 run_timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
@@ -42,47 +59,67 @@ HEADERS = {
 }
 API_URL = "https://api.bseindia.com/BseIndiaAPI/api/AnnSubCategoryGetData/w"
 XBRL_URL = "https://www.bseindia.com/Msource/90D/CorpXbrlGen.aspx"
+# iterparse tag filter for the XBRL attachment element in any namespace.
+ATTACHMENT_TAG = "{*}AttachmentURL"
+
+
+
+xbrl_limiter = AsyncRateLimiter(XBRL_REQUESTS_PER_SECOND, 1.0)
+xbrl_breaker = CircuitBreaker(FAILURE_THRESHOLD, THROTTLE_SECONDS)
+list_limiter = AsyncRateLimiter(LIST_PAGES_PER_SECOND, 1.0)
 
 
+def _is_server_failure(error: Exception) -> bool:
+    """Whether an error means BSE is refusing or struggling, rather than a bad item."""
+    if isinstance(error, etree.XMLSyntaxError):
+        # BSE serves an HTML error page instead of XBRL when it is throttling.
+        return True
+    return isinstance(error, aiohttp.ClientResponseError) and (
+        error.status == 429 or error.status >= 500
+    )
+
 
-throttle_event = Event()
+def _attachment_url(content: bytes) -> str | None:
+    """
+    Returns the text of the first AttachmentURL element in an XBRL document,
+    in whatever namespace. The iterparse tag filter is applied by lxml while
+    parsing, and parsing stops at the first match, so no tree is built or
+    walked. Raises XMLSyntaxError for a non-XML response.
+    """
+    for _, elem in etree.iterparse(
+        io.BytesIO(content), events=("end",), tag=ATTACHMENT_TAG
+    ):
+        return elem.text
+    return None
 
 
 async def fetch_pdf_url_async(session, news_id, scrip_code, company_name):
     """Asynchronously fetches the PDF URL with retries and better logging."""
     params = {"Bsenewid": news_id, "Scripcode": scrip_code}
     for attempt in range(5):
-        
-        if throttle_event.is_set():
-            logger.warning(
-                f"Throttling is active. Worker for {company_name} pausing..."
-            )
-            await asyncio.sleep(THROTTLE_SECONDS)
-            throttle_event.clear()  
-
+        await xbrl_breaker.admit()
+        # Whatever ends this attempt, the breaker hears about it, so a
+        # half-open probe that times out or gets a 404 can't stall the rest.
+        settled = False
         try:
-            async with session.get(
-                XBRL_URL, params=params, headers=HEADERS, timeout=20
-            ) as response:
+            await xbrl_limiter.acquire()
+            async with session.get(XBRL_URL, params=params, timeout=20) as response:
                 response.raise_for_status()
                 content = await response.read()
 
-                
-                root = etree.fromstring(
-                    content
-                )  
+
+                pdf_url = _attachment_url(content)
 
                 if attempt > 0:
                     logger.info(
                         f"✅ SUCCESS on attempt {attempt+1}/5 for {company_name} ({news_id})"
                     )
 
-                for elem in root.getiterator():
-                    if "}" in elem.tag:
-                        elem.tag = elem.tag.split("}", 1)[1]
-                pdf_url_element = root.find(".//AttachmentURL")
-                if pdf_url_element is not None and pdf_url_element.text:
-                    return pdf_url_element.text
+                await xbrl_breaker.record_success()
+                settled = True
+
+                if pdf_url:
+                    return pdf_url
 
                 logger.warning(
                     f"AttachmentURL not found for {company_name} ({news_id})"
@@ -95,11 +132,14 @@ async def fetch_pdf_url_async(session, news_id, scrip_code, company_name):
                 f"Attempt {attempt+1}/5 for {company_name} ({news_id}) failed: {type(e).__name__}. Retrying in {wait_time}s..."
             )
 
-            
-            if isinstance(e, etree.XMLSyntaxError):
-                throttle_event.set() 
+            if _is_server_failure(e):
+                await xbrl_breaker.record_failure()
+                settled = True
+        finally:
+            if not settled:
+                xbrl_breaker.release_probe()
 
-            await asyncio.sleep(wait_time)
+        await asyncio.sleep(wait_time)
 
     logger.error(
         f"❌ All 5 retries failed for {company_name} ({news_id}). Giving up on this item."
@@ -107,9 +147,8 @@ async def fetch_pdf_url_async(session, news_id, scrip_code, company_name):
     return None
 
 
-def save_to_db_threaded(db_path: str, item: dict, pdf_url: str):
-    """This function is executed in a separate thread and creates its own connection."""
-    
+def _announcement_row(item: dict, pdf_url: str):
+    """The announcements row for an item, or None when its date can't be parsed."""
     try:
         date_string = item.get("DissemDT", "")
         dt_object = datetime.fromisoformat(date_string)
@@ -118,56 +157,91 @@ def save_to_db_threaded(db_path: str, item: dict, pdf_url: str):
         logger.warning(
             f"Invalid date format '{date_string}' for {item.get('NEWSID')}. Skipping DB insert."
         )
-        return
+        return None
+    return (
+        item.get("NEWSID"),
+        str(item.get("SCRIP_CD")),
+        item.get("SLONGNAME", "N/A").strip(),
+        ann_date,
+        pdf_url,
+    )
+
 
-    with sqlite3.connect(db_path) as conn:
+async def db_writer(conn: sqlite3.Connection, write_queue: Queue, seen: set):
+    """
+    The only task that writes to the database. Drains rows from write_queue
+    in batches of up to WRITE_BATCH_SIZE (or whatever arrived within
+    WRITE_BATCH_SECONDS) and inserts each batch with a single executemany,
+    adding the stored NEWSIDs to seen. A None on the queue stops it.
+    """
+    loop = asyncio.get_running_loop()
+    stopping = False
+    while not stopping:
+        row = await write_queue.get()
+        if row is None:
+            break
+        rows = [row]
+        deadline = loop.time() + WRITE_BATCH_SECONDS
+        while len(rows) < WRITE_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                row = await asyncio.wait_for(write_queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if row is None:
+                stopping = True
+                break
+            rows.append(row)
         try:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                INSERT INTO announcements (news_id, scrip_code, company_name, announcement_date, pdf_url)
-                VALUES (?, ?, ?, ?, ?)
-                """,
-                (
-                    item.get("NEWSID"),
-                    str(item.get("SCRIP_CD")),
-                    item.get("SLONGNAME", "N/A").strip(),
-                    ann_date,
-                    pdf_url,
-                ),
-            )
-            conn.commit()
-        except sqlite3.IntegrityError:
-            pass
-        except Exception as e:
-            logger.error(f"DB Insert failed for {item.get('NEWSID')}: {e}")
+            await asyncio.to_thread(bulk_insert_announcements, conn, rows)
+            seen.update(row[0] for row in rows)
+        except sqlite3.Error as e:
+            logger.error(f"DB Insert failed for a batch of {len(rows)} rows: {e}")
 
 
-async def worker(name: str, queue: Queue, db_path: str):
-    """The worker task that processes items from the queue."""
-    
-    async with aiohttp.ClientSession() as session:
-        while True:
-            item = await queue.get()
-            if item is None:
-                break
+async def worker(
+    name: str, queue: Queue, write_queue: Queue, session: aiohttp.ClientSession
+):
+    """The worker task that processes items from the queue, on the shared session."""
+    while True:
+        item = await queue.get()
+        if item is None:
+            break
 
-            pdf_url = await fetch_pdf_url_async(
-                session,
-                item.get("NEWSID"),
-                item.get("SCRIP_CD"),
-                item.get("SLONGNAME", "N/A").strip(),
-            )
+        pdf_url = await fetch_pdf_url_async(
+            session,
+            item.get("NEWSID"),
+            item.get("SCRIP_CD"),
+            item.get("SLONGNAME", "N/A").strip(),
+        )
+
+        if pdf_url and (row := _announcement_row(item, pdf_url)):
+            await write_queue.put(row)
+            logger.info(f"[{name}] Stored: {item.get('SLONGNAME', 'N/A').strip()}")
 
-            if pdf_url:
-                await asyncio.to_thread(save_to_db_threaded, db_path, item, pdf_url)
-                logger.info(f"[{name}] Stored: {item.get('SLONGNAME', 'N/A').strip()}")
+        queue.task_done()
 
-            queue.task_done()
 
 
+async def _fetch_page(session: aiohttp.ClientSession, params: dict) -> dict:
+    """Fetches one page of the announcement list, paced by the list limiter."""
+    await list_limiter.acquire()
+    async with session.get(
+        API_URL, params=params, timeout=aiohttp.ClientTimeout(total=60)
+    ) as response:
+        response.raise_for_status()
+        return orjson.loads(await response.read())
+
 
-def fetch_announcements_for_period(session, from_date, to_date):
+async def fetch_announcements_for_period(session, from_date, to_date):
+    """
+    Fetches every announcement of a period. Page 1 gives the total page
+    count; the remaining pages are independent, so they are fetched
+    concurrently (up to MAX_CONCURRENT_PAGES, paced by list_limiter) and
+    kept in page order.
+    """
     params = {
         "pageno": 1,
         "strCat": "Company Update",
@@ -181,10 +255,8 @@ def fetch_announcements_for_period(session, from_date, to_date):
     all_announcements = []
     logger.info(f"Fetching announcement list for {from_date} -> {to_date}...")
     try:
-        response = session.get(API_URL, headers=HEADERS, params=params, timeout=60)
-        response.raise_for_status()
-        data = response.json()
-    except (requests.RequestException, ValueError) as e:
+        data = await _fetch_page(session, params)
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
         logger.error(
             f"FATAL: API request failed for the first page. Cannot proceed for this period. Error: {e}"
         )
@@ -207,31 +279,42 @@ def fetch_announcements_for_period(session, from_date, to_date):
         logger.info(
             f"Total records for period: {total_records} | Total pages: {total_pages}"
         )
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_PAGES)
+
+        async def fetch_page(page: int) -> list:
+            async with semaphore:
+                logger.info(f"  -> Fetching page {page}/{total_pages}")
+                try:
+                    page_data = await _fetch_page(session, {**params, "pageno": page})
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                    logger.error(
+                        f"API request failed on page {page}. Skipping it. Error: {e}"
+                    )
+                    return []
+                return page_data.get("Table", [])
 
-    current_page = 2
-    while True:
-        if total_pages != -1 and current_page > total_pages:
-            break
-        params["pageno"] = current_page
-        logger.info(
-            f"  -> Fetching page {current_page}/{total_pages if total_pages != -1 else '?'}"
-        )
-        try:
-            response = session.get(API_URL, headers=HEADERS, params=params, timeout=60)
-            response.raise_for_status()
-            page_data = response.json().get("Table", [])
-
+        for page_data in await asyncio.gather(
+            *(fetch_page(page) for page in range(2, total_pages + 1))
+        ):
+            all_announcements.extend(page_data)
+    else:
+        # Without a record count, walk pages until one comes back empty.
+        current_page = 2
+        while True:
+            logger.info(f"  -> Fetching page {current_page}/?")
+            try:
+                page_data = (
+                    await _fetch_page(session, {**params, "pageno": current_page})
+                ).get("Table", [])
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                logger.error(
+                    f"API request failed on page {current_page}. Stopping. Error: {e}"
+                )
+                break
             if not page_data:
                 break
-
             all_announcements.extend(page_data)
             current_page += 1
-            time.sleep(1)
-        except (requests.RequestException, ValueError) as e:
-            logger.error(
-                f"API request failed on page {current_page}. Stopping. Error: {e}"
-            )
-            break
 
     logger.info(
         f"Finished fetching a total of {len(all_announcements)} announcements for the period."
@@ -245,72 +328,101 @@ async def main():
     logger.info("👷‍♂️ Using %s concurrent workers.", MAX_CONCURRENT_WORKERS)
     logger.info("🗓️ Fetching data in 7-day chunks for maximum reliability.")
 
-    conn_read_only = sqlite3.connect(HISTORICAL_DB)
+    # Creates the table, or migrates an older one, before anything is inserted.
+    initialize_database(HISTORICAL_DB)
+    conn = sqlite3.connect(HISTORICAL_DB, check_same_thread=False)
+    # The shared pragmas; WAL lets the scraper read while the backfill writes.
+    conn.executescript(SQLITE_PRAGMAS)
+    # Loaded once; the writer adds every NEWSID it stores.
+    seen = {row[0] for row in conn.execute("SELECT news_id FROM announcements")}
+    logger.info(f"📚 {len(seen)} announcements already in the database.")
+    write_queue = Queue()
+    writer_task = asyncio.create_task(db_writer(conn, write_queue, seen))
 
     end_date = datetime.now()
 
     total_weeks_to_process = (MONTHS_TO_BACKFILL * 4) + 4
 
-    with requests.Session() as list_fetch_session:
-        for i in range(total_weeks_to_process):
-            chunk_end_date = end_date - timedelta(days=i * 7)
-            chunk_start_date = chunk_end_date - timedelta(days=6)
+    # One pooled session for the list pages and every worker, so requests
+    # reuse warm connections instead of each paying its own DNS + TLS setup.
+    connector = aiohttp.TCPConnector(
+        limit=MAX_CONCURRENT_WORKERS + MAX_CONCURRENT_PAGES,
+        limit_per_host=max(MAX_CONCURRENT_WORKERS, MAX_CONCURRENT_PAGES),
+        ttl_dns_cache=300,
+    )
+    session = aiohttp.ClientSession(connector=connector, headers=HEADERS)
 
-            from_date_str = chunk_start_date.strftime("%Y%m%d")
-            to_date_str = chunk_end_date.strftime("%Y%m%d")
+    try:
+        await _backfill_periods(
+            seen, write_queue, session, end_date, total_weeks_to_process
+        )
+    finally:
+        await session.close()
+        # Let the writer commit whatever is still queued before closing.
+        await write_queue.put(None)
+        await writer_task
+        # Refreshes planner statistics after the bulk load, if they need it.
+        conn.execute("PRAGMA optimize")
+        conn.close()
+    logger.info("✅ Historical backfill finished.")
 
-            logger.info(
-                f"\n--- Processing period: {from_date_str} to {to_date_str} ---"
-            )
 
-            announcements = fetch_announcements_for_period(
-                list_fetch_session, from_date_str, to_date_str
-            )
-            if not announcements:
-                continue
-
-            cursor = conn_read_only.cursor()
-            news_ids_in_db = {
-                row[0] for row in cursor.execute("SELECT news_id FROM announcements")
-            }
-            items_to_process = [
-                item
-                for item in announcements
-                if item.get("NEWSID") not in news_ids_in_db
-            ]
-
-            if not items_to_process:
-                logger.info(
-                    "All announcements for this period are already in the database."
-                )
-                continue
+async def _backfill_periods(
+    seen: set,
+    write_queue: Queue,
+    session: aiohttp.ClientSession,
+    end_date: datetime,
+    total_weeks_to_process: int,
+):
+    """Walks back week by week, storing the PDF URLs of announcements not yet in the DB."""
+    for i in range(total_weeks_to_process):
+        chunk_end_date = end_date - timedelta(days=i * 7)
+        chunk_start_date = chunk_end_date - timedelta(days=6)
+
+        from_date_str = chunk_start_date.strftime("%Y%m%d")
+        to_date_str = chunk_end_date.strftime("%Y%m%d")
+
+        logger.info(f"\n--- Processing period: {from_date_str} to {to_date_str} ---")
+
+        announcements = await fetch_announcements_for_period(
+            session, from_date_str, to_date_str
+        )
+        if not announcements:
+            continue
+
+        items_to_process = [
+            item for item in announcements if item.get("NEWSID") not in seen
+        ]
 
+        if not items_to_process:
             logger.info(
-                f"Found {len(items_to_process)} new announcements to process in this chunk."
+                "All announcements for this period are already in the database."
             )
+            continue
 
-            queue = Queue()
-            for item in items_to_process:
-                await queue.put(item)
+        logger.info(
+            f"Found {len(items_to_process)} new announcements to process in this chunk."
+        )
 
-            workers = [
-                asyncio.create_task(worker(f"Worker-{w+1}", queue, HISTORICAL_DB))
-                for w in range(MAX_CONCURRENT_WORKERS)
-            ]
+        queue = Queue()
+        for item in items_to_process:
+            await queue.put(item)
 
-            await queue.join()
+        workers = [
+            asyncio.create_task(worker(f"Worker-{w+1}", queue, write_queue, session))
+            for w in range(MAX_CONCURRENT_WORKERS)
+        ]
 
-            for _ in range(MAX_CONCURRENT_WORKERS):
-                await queue.put(None)
+        await queue.join()
 
-            await asyncio.gather(*workers)
+        for _ in range(MAX_CONCURRENT_WORKERS):
+            await queue.put(None)
 
-            logger.info(
-                f"--- Chunk complete. Processed {len(items_to_process)} items. ---"
-            )
+        await asyncio.gather(*workers)
 
-    conn_read_only.close()
-    logger.info("✅ Historical backfill finished.")
+        logger.info(
+            f"--- Chunk complete. Processed {len(items_to_process)} items. ---"
+        )
 
 
 if __name__ == "__main__":
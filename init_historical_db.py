@@ -4,61 +4,133 @@ import sqlite3
 from pathlib import Path
 import logging
 
-# Configure basic logging for this standalone script
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-)
+from core.db_handler import SQLITE_PRAGMAS
+from core.historical_db_handler import LATEST_ANNOUNCEMENT_INDEX_SQL, pdf_url_hash
 
 DB_NAME = "historical_announcements.db"
 DB_PATH = Path(DB_NAME)
 
+# We store dates as TEXT in ISO format (YYYY-MM-DD) for easy sorting and reading.
+# PDF uniqueness is enforced on a 64-bit hash of the URL (see pdf_url_hash),
+# which keeps that index far smaller than one over the URL strings.
+CREATE_ANNOUNCEMENTS_SQL = """
+CREATE TABLE IF NOT EXISTS {table} (
+    news_id TEXT PRIMARY KEY,
+    scrip_code TEXT NOT NULL,
+    company_name TEXT NOT NULL,
+    announcement_date TEXT NOT NULL,
+    pdf_url TEXT NOT NULL,
+    pdf_url_hash INTEGER NOT NULL UNIQUE
+)
+"""
+# Summaries are kilobytes of JSON each, so they live in their own table: the
+# announcements pages then hold only the small metadata rows the lookups scan.
+CREATE_SUMMARIES_SQL = """
+CREATE TABLE IF NOT EXISTS announcement_summaries (
+    news_id TEXT PRIMARY KEY,
+    summary_json BLOB NOT NULL
+)
+"""
+# Each announcement with its summary (NULL when it has none yet).
+CREATE_FULL_VIEW_SQL = """
+CREATE VIEW IF NOT EXISTS announcements_full AS
+SELECT a.news_id, a.scrip_code, a.company_name, a.announcement_date,
+       a.pdf_url, a.pdf_url_hash, s.summary_json
+FROM announcements a
+LEFT JOIN announcement_summaries s ON s.news_id = a.news_id
+"""
+SCHEMA_VERSION = 2
+
+
+def _migrate(conn: sqlite3.Connection):
+    """
+    Brings an existing database up to the current schema in one transaction.
+    The applied version is kept in PRAGMA user_version, as in
+    core/db_handler.py.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(announcements)")}
+    conn.execute("BEGIN")
+    if "summary_json" in columns:
+        # Version 2: summaries move to announcement_summaries. They are copied
+        # out first, so the rebuild below needn't carry them.
+        logging.info("Moving summaries to 'announcement_summaries'...")
+        conn.execute(
+            """
+            INSERT INTO announcement_summaries (news_id, summary_json)
+            SELECT news_id, summary_json FROM announcements
+            WHERE summary_json IS NOT NULL
+            """
+        )
+    if "pdf_url_hash" not in columns:
+        # Version 1: SQLite can't drop the old UNIQUE(pdf_url) in place, so the
+        # table is rebuilt with the hash column, filled from each row's URL.
+        logging.info("Rebuilding 'announcements' with a pdf_url_hash column...")
+        conn.create_function("pdf_url_hash", 1, pdf_url_hash, deterministic=True)
+        conn.execute(CREATE_ANNOUNCEMENTS_SQL.format(table="announcements_new"))
+        conn.execute(
+            """
+            INSERT INTO announcements_new
+                (news_id, scrip_code, company_name, announcement_date,
+                 pdf_url, pdf_url_hash)
+            SELECT news_id, scrip_code, company_name, announcement_date,
+                   pdf_url, pdf_url_hash(pdf_url)
+            FROM announcements
+            """
+        )
+        conn.execute("DROP TABLE announcements")
+        conn.execute("ALTER TABLE announcements_new RENAME TO announcements")
+    elif "summary_json" in columns:
+        conn.execute("ALTER TABLE announcements DROP COLUMN summary_json")
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.commit()
+
 
-def initialize_database():
+def initialize_database(db_path=DB_PATH):
     """
     Creates and initializes the historical announcements database and table.
     This script is safe to run multiple times.
     """
-    if DB_PATH.exists():
-        logging.warning(f"Database '{DB_NAME}' already exists. Verifying schema.")
+    db_path = Path(db_path)
+    if db_path.exists():
+        logging.warning(f"Database '{db_path.name}' already exists. Verifying schema.")
 
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = sqlite3.connect(db_path)
+        # journal_mode=WAL is stored in the file, so every later connection
+        # (the scraper's, the backfill's) opens it in WAL mode as well.
+        conn.executescript(SQLITE_PRAGMAS)
         cursor = conn.cursor()
 
         logging.info(
-            f"Creating 'announcements' table in {DB_NAME} if it doesn't exist..."
+            f"Creating 'announcements' table in {db_path.name} if it doesn't exist..."
         )
 
-        # We store dates as TEXT in ISO format (YYYY-MM-DD) for easy sorting and reading
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS announcements (
-                news_id TEXT PRIMARY KEY,
-                scrip_code TEXT NOT NULL,
-                company_name TEXT NOT NULL,
-                announcement_date TEXT NOT NULL,
-                pdf_url TEXT NOT NULL UNIQUE,
-                summary_json TEXT
-            )
-        """
-        )
+        cursor.execute(CREATE_ANNOUNCEMENTS_SQL.format(table="announcements"))
+        cursor.execute(CREATE_SUMMARIES_SQL)
+        _migrate(conn)
+        cursor.execute(CREATE_FULL_VIEW_SQL)
 
         logging.info("Creating indexes for faster queries...")
-        # Index for quickly finding the last announcement for a company
-        cursor.execute(
-            """
-            CREATE INDEX IF NOT EXISTS idx_scrip_code_date 
-            ON announcements (scrip_code, announcement_date)
-        """
-        )
+        # Covering index for quickly finding the last announcement for a company
+        cursor.executescript(LATEST_ANNOUNCEMENT_INDEX_SQL)
+        # Fresh statistics so the query planner actually picks that index.
+        cursor.execute("ANALYZE")
 
         conn.commit()
+        cursor.execute("PRAGMA optimize")
         conn.close()
-        logging.info(f"✅ Database '{DB_NAME}' is ready.")
+        logging.info(f"✅ Database '{db_path.name}' is ready.")
 
     except sqlite3.Error as e:
         logging.error(f"❌ Database error: {e}")
 
 
 if __name__ == "__main__":
+    # Configure basic logging for this standalone script
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
     initialize_database()
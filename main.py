@@ -1,93 +1,104 @@
 # main.py
 
-import time
 import asyncio
 import logging
-from datetime import datetime
-from pathlib import Path
-import sys 
-import traceback  
+import signal
 from core.scraper import BSEScraper
+from core import logging_setup
+from init_historical_db import initialize_database
 
+try:
+    # uvloop runs the event loop on libuv; asyncio's default loop otherwise.
+    import uvloop
 
-
-def handle_exception(exc_type, exc_value, exc_traceback):
-    """Logs unhandled exceptions to the root logger."""
-    logger = logging.getLogger()
-    if logger.handlers:
-        
-        tb_lines = traceback.format_exception(exc_type, exc_value, exc_traceback)
-        tb_text = "".join(tb_lines)
-        logger.critical(f"Unhandled exception:\n{tb_text}")
-    
-    sys.__excepthook__(exc_type, exc_value, exc_traceback)
-
-
-def setup_logging():
-    """Configures the root logger for the entire application run."""
-    run_timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    log_dir = Path("logs") / f"LIVE-{run_timestamp}"
-    log_dir.mkdir(parents=True, exist_ok=True)
-
-    
-    logger = logging.getLogger()
-    logger.setLevel(logging.INFO)
-
-    
-
-    if logger.hasHandlers():
-        logger.handlers.clear()
-
-    
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-
-    
-    stream_handler = logging.StreamHandler()
-    stream_handler.setFormatter(formatter)
-    logger.addHandler(stream_handler)
-
-    
-    file_handler = logging.FileHandler(log_dir / "run.log")
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-
-    # --- Control third-party library verbosity ---
-    
-    logging.getLogger("google.api_core").setLevel(logging.WARNING)
-    logging.getLogger("google.auth.transport.requests").setLevel(logging.WARNING)
-    logging.getLogger("urllib3.connectionpool").setLevel(logging.WARNING)
-    logging.getLogger("google_genai.types").setLevel(logging.ERROR)
-
-    return log_dir
+    uvloop.install()
+except ImportError:
+    pass
 
 
-async def run_single_poll():
+async def run_single_poll(scraper: BSEScraper) -> bool:
     """
-    Encapsulates the logic for a single polling run.
+    Encapsulates the logic for a single polling run on the long-lived scraper.
     It relies on the logger that was already configured by the main() function.
+    Returns False if the poll failed.
     """
     
     logger = logging.getLogger(__name__)
     logger.info("--- Starting new poll cycle ---")
 
     try:
-        
-        scraper = BSEScraper(test_mode=False)
-
-        notification_tasks = await scraper.run()
+        notification_tasks = await scraper.poll_once()
 
         if notification_tasks:
-            await scraper.run_all_notifications_sequentially(notification_tasks)
+            await scraper.run_all_notifications_concurrently(notification_tasks)
 
-        scraper.db.close()
         logger.info("--- Poll cycle complete ---")
+        return True
 
     except Exception as e:
         logger.error(
-            f"An unexpected error occurred during the poll: {e}", exc_info=True
+            "An unexpected error occurred during the poll: %s", e, exc_info=True
         )
+        return False
+
+
+async def discard_scraper(scraper: BSEScraper):
+    """Closes a scraper after a failure; errors while closing are only logged."""
+    try:
+        await scraper.aclose()
+    except Exception as e:
+        logging.getLogger(__name__).warning(
+            "Error while closing the failed scraper: %s", e, exc_info=True
+        )
+
+
+async def scheduler(polling_interval_seconds: int):
+    """
+    Polls forever on one event loop and one long-lived scraper, so connection
+    pools, DNS caches and the PDF worker pool stay warm between polls. The
+    scraper is built on the first poll and rebuilt after a failure, so a
+    broken session or connection isn't reused. The wait between polls is on
+    the loop, so SIGINT/SIGTERM stop it at once.
+    """
+    logger = logging.getLogger(__name__)
+    loop = asyncio.get_running_loop()
+    this_task = asyncio.current_task()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, this_task.cancel)
+        except NotImplementedError:
+            pass
+
+    scraper = None
+    try:
+        while True:
+            try:
+                if scraper is None:
+                    scraper = BSEScraper(test_mode=False)
+                if not await run_single_poll(scraper):
+                    await discard_scraper(scraper)
+                    scraper = None
+
+                logger.info(
+                    "Waiting for %s seconds before next run...", polling_interval_seconds
+                )
+                await asyncio.sleep(polling_interval_seconds)
+
+            except Exception as e:
+                
+                logger.critical(
+                    "A critical error occurred in the main loop: %s", e, exc_info=True
+                )
+                if scraper is not None:
+                    await discard_scraper(scraper)
+                    scraper = None
+                logger.info("Restarting loop in 60 seconds...")
+                await asyncio.sleep(60)
+    except asyncio.CancelledError:
+        logger.info("\n🛑 Scraper stopped by user.")
+    finally:
+        if scraper is not None:
+            await scraper.aclose()
 
 
 def main():
@@ -98,39 +109,26 @@ def main():
     polling_interval_seconds = 60
 
     
-    log_path = setup_logging()
+    log_path = logging_setup.configure("LIVE")
 
-    
-    sys.excepthook = handle_exception
+    logging_setup.install_excepthook()
 
     
     logger = logging.getLogger(__name__)
 
     logger.info("🚀 Starting BSE Real-Time Scraper...")
-    logger.info(f"Full logs for this run are in: {log_path}")
-    logger.info(f"Polling interval set to {polling_interval_seconds} seconds.")
+    logger.info("Full logs for this run are in: %s", log_path)
+    logger.info("Polling interval set to %s seconds.", polling_interval_seconds)
 
-    while True:
-        try:
-            
-
-            asyncio.run(run_single_poll())
-
-            logger.info(
-                f"Waiting for {polling_interval_seconds} seconds before next run..."
-            )
-            time.sleep(polling_interval_seconds)
-
-        except KeyboardInterrupt:
-            logger.info("\n🛑 Scraper stopped by user.")
-            break
-        except Exception as e:
-            
-            logger.critical(
-                f"A critical error occurred in the main loop: {e}", exc_info=True
-            )
-            logger.info("Restarting loop in 60 seconds...")
-            time.sleep(60)
+    # Schema, indexes and planner statistics are settled once, up front; the
+    # scraper's connections then assume they exist.
+    initialize_database()
+
+    try:
+        asyncio.run(scheduler(polling_interval_seconds))
+    except KeyboardInterrupt:
+        # Only reached where the loop cannot install signal handlers (Windows).
+        logger.info("\n🛑 Scraper stopped by user.")
 
 
 if __name__ == "__main__":
@@ -1,100 +1,80 @@
 # test_single.py
 
 from core.scraper import BSEScraper
+from core import logging_setup
+from init_historical_db import initialize_database
 import asyncio
 import logging
-from datetime import datetime
-from pathlib import Path
 import os
-import sys  
-import traceback  
-
-
-
-def handle_exception(exc_type, exc_value, exc_traceback):
-    """Logs unhandled exceptions to the root logger."""
-    logger = logging.getLogger()
-    if logger.handlers:
-        
-        tb_lines = traceback.format_exception(exc_type, exc_value, exc_traceback)
-        tb_text = "".join(tb_lines)
-        logger.critical(f"Unhandled exception:\n{tb_text}")
-    
-    sys.__excepthook__(exc_type, exc_value, exc_traceback)
-
-
-def setup_logging():
-    """Configures the root logger for the application run."""
-    run_timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    log_dir = Path("logs") / f"SINGLE_TEST-{run_timestamp}"
-    log_dir.mkdir(parents=True, exist_ok=True)
-
-    
-    logger = logging.getLogger()
-    logger.setLevel(logging.INFO)
-
-    
-    if logger.hasHandlers():
-        logger.handlers.clear()
-
-    
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-
-    
-    stream_handler = logging.StreamHandler()
-    stream_handler.setFormatter(formatter)
-    logger.addHandler(stream_handler)
-
-    
-    file_handler = logging.FileHandler(log_dir / "run.log")
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+from pathlib import Path
 
-    # --- Control third-party library verbosity ---
-    
-    logging.getLogger("google.api_core").setLevel(logging.WARNING)
-    logging.getLogger("google.auth.transport.requests").setLevel(logging.WARNING)
-    logging.getLogger("urllib3.connectionpool").setLevel(logging.WARNING)
-    logging.getLogger("google_genai.types").setLevel(logging.ERROR)
+try:
+    # uvloop runs the event loop on libuv; asyncio's default loop otherwise.
+    import uvloop
 
-    return log_dir
+    uvloop.install()
+except ImportError:
+    pass
 
 
 async def main():
-    log_path = setup_logging()
-    
-    sys.excepthook = handle_exception
+    log_path = logging_setup.configure("SINGLE_TEST")
+    logging_setup.install_excepthook()
 
     
     logger = logging.getLogger(__name__)
 
     logger.info("🧪 --- SINGLE PDF TEST ---")
-    logger.info(f"Full logs for this run are in: {log_path}")
-
-    url = os.getenv("SINGLE_TEST_PDF_URL")
-    company = os.getenv("SINGLE_TEST_COMPANY_NAME", "Unknown")
-    scrip = os.getenv("SINGLE_TEST_SCRIP_CODE", "000000")
-
-    if not url:
-        logger.error("❌ SINGLE_TEST_PDF_URL not set in .env")
+    logger.info("Full logs for this run are in: %s", log_path)
+
+    # .env was already loaded, once, when core.scraper was imported.
+    env = os.environ
+    url = env.get("SINGLE_TEST_PDF_URL")
+    urls_file = env.get("SINGLE_TEST_PDF_URLS")
+    company = env.get("SINGLE_TEST_COMPANY_NAME", "Unknown")
+    scrip = env.get("SINGLE_TEST_SCRIP_CODE", "000000")
+
+    if urls_file:
+        # One URL per line; blank lines and # comments are skipped. Every URL
+        # is handled in the same scraper run.
+        urls = [
+            line.strip()
+            for line in Path(urls_file).read_text().splitlines()
+            if line.strip() and not line.lstrip().startswith("#")
+        ]
+        news_ids = [f"SINGLE_TEST_ID_{idx}" for idx in range(1, len(urls) + 1)]
+    elif url:
+        urls = [url]
+        news_ids = ["SINGLE_TEST_ID"]
+    else:
+        logger.error("❌ SINGLE_TEST_PDF_URL (or SINGLE_TEST_PDF_URLS) not set in .env")
         return
 
     mock = [
         {
-            "NEWSID": "SINGLE_TEST_ID",
+            "NEWSID": news_id,
             "SLONGNAME": company,
             "SCRIP_CD": scrip,
-            "PDF_URL_OVERRIDE": url,
+            "PDF_URL_OVERRIDE": pdf_url,
         }
+        for news_id, pdf_url in zip(news_ids, urls)
     ]
+    logger.info("Testing %s PDF(s).", len(mock))
 
+    # The historical schema is settled before the scraper's handlers use it.
+    initialize_database()
     scraper = BSEScraper(test_mode=False)
+    if env.get("FAST_TEST") == "1":
+        await scraper.db.relax_durability()
+        if scraper.historical_db:
+            scraper.historical_db.relax_durability()
+        logger.warning(
+            "⚡ FAST_TEST=1: database writes are not fsynced; a crash can lose them."
+        )
 
     tasks = await scraper.run(announcements_override=mock)
     if tasks:
-        await scraper.run_all_notifications_sequentially(tasks)
+        await scraper.run_all_notifications_concurrently(tasks)
 
     scraper.db.close()
     logger.info("✅ Single test complete.")
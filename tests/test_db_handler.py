@@ -0,0 +1,77 @@
+import tempfile
+import unittest
+import unittest.mock
+from pathlib import Path
+
+from core import db_handler
+from core.db_handler import DBHandler
+
+REJECT_BAD_ROWS = """
+CREATE TRIGGER reject_bad BEFORE INSERT ON announcements
+WHEN NEW.news_id LIKE 'bad%'
+BEGIN SELECT RAISE(ABORT, 'bad row'); END
+"""
+
+
+class DBHandlerTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmp.name) / "database.db"
+        self.db = DBHandler(self.db_path)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def add(self, news_id, pdf_url=None):
+        self.db.add_new_announcement(news_id, "500325", "Acme Ltd", pdf_url)
+
+    async def test_read_sees_every_earlier_write(self):
+        for n in range(1200):
+            self.add(f"id-{n}")
+        self.db.update_summary("id-7", {"executive_summary": "ok"})
+        statuses = await self.db.get_statuses([f"id-{n}" for n in range(1200)])
+        self.assertEqual(len(statuses), 1200)
+        self.assertEqual(statuses["id-7"], "PROCESSED")
+        self.assertTrue(await self.db.is_processed("id-1199"))
+        self.assertFalse(await self.db.needs_summarization("id-7"))
+
+    async def test_close_flushes_queued_writes(self):
+        self.add("id-1", "https://example.com/a.pdf")
+        self.db.close()
+        self.db = DBHandler(self.db_path)
+        self.assertEqual(await self.db.get_pdf_url("id-1"), "https://example.com/a.pdf")
+
+    async def test_get_statuses_spans_chunks_and_dedups(self):
+        for n in range(10):
+            self.add(f"id-{n}")
+        ids = [f"id-{n}" for n in range(10)] + ["id-3", "missing"]
+        with unittest.mock.patch.object(db_handler, "STATUS_LOOKUP_CHUNK_SIZE", 3):
+            statuses = await self.db.get_statuses(ids)
+        self.assertEqual(statuses, {f"id-{n}": "DOWNLOADED" for n in range(10)})
+        self.assertEqual(await self.db.get_statuses([]), {})
+
+    async def test_pdf_cache_round_trip(self):
+        self.db.cache_pdf_result("abc", {"type": "text", "content": "hello"})
+        self.assertEqual(
+            await self.db.get_cached_pdf_result("abc"),
+            {"type": "text", "content": "hello"},
+        )
+        self.assertIsNone(await self.db.get_cached_pdf_result("missing"))
+
+    async def test_bad_write_does_not_drop_its_batch(self):
+        await self.db._call(lambda conn: conn.execute(REJECT_BAD_ROWS))
+        with self.assertLogs("core.db_handler", "ERROR") as logs:
+            self.add("good-1")
+            self.add("bad-1")
+            self.db.cache_pdf_result("abc", {"type": "text"})
+            self.add("good-2")
+            statuses = await self.db.get_statuses(["good-1", "bad-1", "good-2"])
+        self.assertEqual(set(statuses), {"good-1", "good-2"})
+        self.assertIsNotNone(await self.db.get_cached_pdf_result("abc"))
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("news_id=bad-1", logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,207 @@
+import sqlite3
+import tempfile
+import unittest
+import unittest.mock
+from pathlib import Path
+
+import orjson
+
+from core import historical_db_handler
+from core.historical_db_handler import (
+    HistoricalDBHandler,
+    bulk_insert_announcements,
+    pdf_url_hash,
+)
+from init_historical_db import SCHEMA_VERSION, initialize_database
+
+# The table as the first init_historical_db.py created it (user_version 0).
+V0_SCHEMA = """
+CREATE TABLE announcements (
+    news_id TEXT PRIMARY KEY,
+    scrip_code TEXT NOT NULL,
+    company_name TEXT NOT NULL,
+    announcement_date TEXT NOT NULL,
+    pdf_url TEXT NOT NULL UNIQUE,
+    summary_json TEXT
+);
+CREATE INDEX idx_scrip_code_date ON announcements (scrip_code, announcement_date);
+"""
+# Version 1: hashed PDF uniqueness, summaries still inline.
+V1_SCHEMA = """
+CREATE TABLE announcements (
+    news_id TEXT PRIMARY KEY,
+    scrip_code TEXT NOT NULL,
+    company_name TEXT NOT NULL,
+    announcement_date TEXT NOT NULL,
+    pdf_url TEXT NOT NULL,
+    pdf_url_hash INTEGER NOT NULL UNIQUE,
+    summary_json BLOB
+);
+PRAGMA user_version = 1;
+"""
+
+ROWS = [
+    ("n1", "500325", "Acme Ltd", "2024-01-10", "https://example.com/1.pdf"),
+    ("n2", "500325", "Acme Ltd", "2024-04-12", "https://example.com/2.pdf"),
+    ("n3", "500325", "Acme Ltd", "2024-07-15", "https://example.com/3.pdf"),
+    ("n4", "532540", "Beta Corp", "2024-05-01", "https://example.com/4.pdf"),
+]
+
+
+class TempDBCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = Path(self.tmp.name) / "historical_announcements.db"
+
+    def initialize(self):
+        with self.assertLogs(level="INFO"):
+            initialize_database(self.db_path)
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        self.addCleanup(conn.close)
+        return conn
+
+
+class PdfUrlHashTests(unittest.TestCase):
+    def test_stable_signed_64_bit(self):
+        value = pdf_url_hash("https://example.com/a.pdf")
+        self.assertEqual(value, pdf_url_hash("https://example.com/a.pdf"))
+        self.assertTrue(-(2**63) <= value < 2**63)
+
+    def test_distinct_urls_get_distinct_hashes(self):
+        urls = [f"https://www.bseindia.com/xml-data/corpfiling/AttachLive/{n}.pdf" for n in range(20000)]
+        self.assertEqual(len({pdf_url_hash(url) for url in urls}), len(urls))
+
+
+class MigrationTests(TempDBCase):
+    def create(self, schema, rows):
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript(schema)
+        placeholders = ", ".join("?" * len(rows[0]))
+        conn.executemany(f"INSERT INTO announcements VALUES ({placeholders})", rows)
+        conn.commit()
+        conn.close()
+
+    def assert_current_schema(self, conn):
+        self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], SCHEMA_VERSION)
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(announcements)")]
+        self.assertEqual(
+            columns,
+            ["news_id", "scrip_code", "company_name", "announcement_date", "pdf_url", "pdf_url_hash"],
+        )
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list(announcements)")}
+        self.assertIn("idx_scrip_code_date_news", indexes)
+        self.assertNotIn("idx_scrip_code_date", indexes)
+
+    def test_fresh_database(self):
+        self.initialize()
+        self.assert_current_schema(self.connect())
+
+    def test_v0_database_is_migrated(self):
+        self.create(
+            V0_SCHEMA,
+            [(*row, '{"type": "summary"}' if row[0] == "n2" else None) for row in ROWS],
+        )
+        self.initialize()
+        conn = self.connect()
+        self.assert_current_schema(conn)
+        self.assertEqual(
+            conn.execute("SELECT news_id, summary_json FROM announcement_summaries").fetchall(),
+            [("n2", '{"type": "summary"}')],
+        )
+        for pdf_url, stored_hash in conn.execute("SELECT pdf_url, pdf_url_hash FROM announcements"):
+            self.assertEqual(stored_hash, pdf_url_hash(pdf_url))
+        self.assertEqual(
+            conn.execute(
+                "SELECT news_id FROM announcements_full WHERE summary_json IS NOT NULL"
+            ).fetchall(),
+            [("n2",)],
+        )
+
+    def test_v1_database_is_migrated(self):
+        self.create(
+            V1_SCHEMA,
+            [
+                (*row, pdf_url_hash(row[4]), b'{"type":"summary"}' if row[0] == "n1" else None)
+                for row in ROWS
+            ],
+        )
+        self.initialize()
+        conn = self.connect()
+        self.assert_current_schema(conn)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM announcements").fetchone()[0], 4)
+        self.assertEqual(
+            conn.execute("SELECT news_id FROM announcement_summaries").fetchall(), [("n1",)]
+        )
+
+    def test_initialize_is_idempotent(self):
+        self.create(V0_SCHEMA, [(*row, None) for row in ROWS])
+        self.initialize()
+        self.initialize()
+        conn = self.connect()
+        self.assert_current_schema(conn)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM announcements").fetchone()[0], 4)
+
+
+class BulkInsertTests(TempDBCase):
+    def test_skips_known_news_ids_and_pdfs(self):
+        self.initialize()
+        conn = self.connect()
+        self.assertEqual(bulk_insert_announcements(conn, ROWS), 4)
+        again = [
+            ROWS[0],  # same news_id
+            ("n9", "500325", "Acme Ltd", "2024-09-01", ROWS[1][4]),  # same PDF
+            ("n10", "500325", "Acme Ltd", "2024-10-01", "https://example.com/10.pdf"),
+        ]
+        self.assertEqual(bulk_insert_announcements(conn, again), 1)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM announcements").fetchone()[0], 5)
+
+
+class LatestLookupTests(TempDBCase):
+    def setUp(self):
+        super().setUp()
+        self.initialize()
+        bulk_insert_announcements(self.connect(), ROWS)
+        self.db = HistoricalDBHandler(self.db_path)
+        self.addCleanup(self.db.close)
+        self.db.update_summary("n2", {"type": "summary", "executive_summary": "Q1"})
+
+    def test_latest_strictly_before_the_date(self):
+        latest = self.db.get_latest_announcement_for_scrip("500325", "2024-07-15")
+        self.assertEqual(latest["news_id"], "n2")
+        self.assertEqual(orjson.loads(latest["summary_json"])["executive_summary"], "Q1")
+        self.assertIsNone(self.db.get_latest_announcement_for_scrip("500325", "2024-01-10"))
+
+    def test_many_matches_single_lookups(self):
+        pairs = [
+            ("500325", "2024-07-15"),
+            ("500325", "2024-12-31"),
+            ("500325", "2024-01-10"),  # nothing earlier
+            ("532540", "2024-06-01"),
+            ("999999", "2024-06-01"),  # unknown scrip
+            ("500325", "2024-07-15"),  # repeated
+        ]
+        with unittest.mock.patch.object(historical_db_handler, "LOOKUP_CHUNK_SIZE", 2):
+            results = self.db.get_latest_for_many(pairs)
+        self.assertEqual(
+            {pair: row["news_id"] for pair, row in results.items()},
+            {
+                ("500325", "2024-07-15"): "n2",
+                ("500325", "2024-12-31"): "n3",
+                ("532540", "2024-06-01"): "n4",
+            },
+        )
+        for pair, row in results.items():
+            self.assertEqual(row, self.db.get_latest_announcement_for_scrip(*pair))
+
+    def test_pairs_resolving_to_one_row_share_it(self):
+        results = self.db.get_latest_for_many(
+            [("500325", "2024-05-01"), ("500325", "2024-06-01")]
+        )
+        self.assertIs(results[("500325", "2024-05-01")], results[("500325", "2024-06-01")])
+
+
+if __name__ == "__main__":
+    unittest.main()
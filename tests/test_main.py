@@ -0,0 +1,65 @@
+import asyncio
+import unittest
+import unittest.mock
+import warnings
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", FutureWarning)
+    import main
+
+
+class FakeScraper:
+    """Stands in for BSEScraper; polls fail while `failures` lasts."""
+
+    def __init__(self, world):
+        self.world = world
+        self.closed = 0
+        world["built"].append(self)
+
+    async def poll_once(self):
+        self.world["polls"] += 1
+        if self.world["polls"] >= self.world["stop_after"]:
+            self.world["scheduler"].cancel()
+        if self.world["failures"]:
+            self.world["failures"] -= 1
+            raise ConnectionError("session broke")
+        return []
+
+    async def aclose(self):
+        self.closed += 1
+
+
+class SchedulerTests(unittest.IsolatedAsyncioTestCase):
+    async def run_scheduler(self, failures, stop_after):
+        world = {"built": [], "polls": 0, "failures": failures, "stop_after": stop_after}
+        with unittest.mock.patch.object(
+            main, "BSEScraper", lambda test_mode=False: FakeScraper(world)
+        ):
+            task = asyncio.ensure_future(main.scheduler(0))
+            world["scheduler"] = task
+            await asyncio.wait_for(task, 1)
+        return world["built"]
+
+    async def test_one_scraper_serves_every_good_poll(self):
+        built = await self.run_scheduler(failures=0, stop_after=3)
+        self.assertEqual(len(built), 1)
+        self.assertEqual(built[0].closed, 1)
+
+    async def test_failed_poll_discards_the_scraper(self):
+        built = await self.run_scheduler(failures=1, stop_after=3)
+        self.assertEqual(len(built), 2)
+        self.assertEqual([scraper.closed for scraper in built], [1, 1])
+
+    async def test_scraper_is_built_lazily(self):
+        world = {"built": []}
+        with unittest.mock.patch.object(
+            main, "BSEScraper", lambda test_mode=False: FakeScraper(world)
+        ):
+            task = asyncio.ensure_future(main.scheduler(0))
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self.assertEqual(world["built"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import re
+import sys
+import unittest
+
+from core.processor import URL_WHITESPACE, PDFProcessor
+
+
+class ExtractLinksTests(unittest.TestCase):
+    def setUp(self):
+        self.processor = PDFProcessor()
+
+    def test_classifies_media_and_web_links(self):
+        links = self.processor._extract_links(
+            "Audio: https://example.com/call.MP3?x=1, slides at http://example.com/deck."
+        )
+        self.assertEqual(
+            links,
+            [
+                {"url": "https://example.com/call.MP3?x=1", "link_type": "media"},
+                {"url": "http://example.com/deck", "link_type": "web"},
+            ],
+        )
+
+    def test_deduplicates_links(self):
+        links = self.processor._extract_links(
+            "https://example.com/a.mp4 and again https://example.com/a.mp4"
+        )
+        self.assertEqual(len(links), 1)
+
+    def test_malformed_host_is_a_web_link(self):
+        links = self.processor._extract_links(
+            "https://[broken.example.com/call.mp3 then https://example.com/b.wav"
+        )
+        self.assertEqual(
+            [link["link_type"] for link in links], ["web", "media"]
+        )
+
+    def test_url_ends_at_a_non_breaking_space(self):
+        links = self.processor._extract_links(
+            "Audio: https://example.com/call.mp3\xa0Dial-in\u3000https://example.com/q.m4a\u2028next"
+        )
+        self.assertEqual(
+            links,
+            [
+                {"url": "https://example.com/call.mp3", "link_type": "media"},
+                {"url": "https://example.com/q.m4a", "link_type": "media"},
+            ],
+        )
+
+    def test_url_whitespace_is_exactly_unicode_whitespace(self):
+        # What RE2 sees in the pattern must match what `re` means by \s.
+        spelled_out = re.compile(f"[{URL_WHITESPACE}]")
+        unicode_space = re.compile(r"\s")
+        chars = [chr(code) for code in range(sys.maxunicode + 1)]
+        self.assertEqual(
+            {char for char in chars if spelled_out.match(char)},
+            {char for char in chars if unicode_space.match(char)},
+        )
+
+    def test_text_without_urls(self):
+        self.assertEqual(self.processor._extract_links("No links here."), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
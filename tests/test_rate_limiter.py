@@ -0,0 +1,106 @@
+import asyncio
+import unittest
+
+from core.rate_limiter import AsyncRateLimiter, CircuitBreaker
+
+COOLDOWN = 0.05
+
+
+async def admitted(breaker: CircuitBreaker, timeout: float = 0.2) -> bool:
+    """Whether admit() returns within the timeout."""
+    try:
+        await asyncio.wait_for(breaker.admit(), timeout)
+    except asyncio.TimeoutError:
+        return False
+    return True
+
+
+class CircuitBreakerTests(unittest.IsolatedAsyncioTestCase):
+    async def trip(self, breaker: CircuitBreaker):
+        for _ in range(breaker.failure_threshold):
+            await breaker.admit()
+            await breaker.record_failure()
+
+    async def test_stays_closed_below_threshold(self):
+        breaker = CircuitBreaker(3, COOLDOWN)
+        await breaker.record_failure()
+        await breaker.record_failure()
+        self.assertEqual(breaker.state, "closed")
+        self.assertTrue(await admitted(breaker, 0.01))
+
+    async def test_success_resets_failure_count(self):
+        breaker = CircuitBreaker(2, COOLDOWN)
+        await breaker.record_failure()
+        await breaker.record_success()
+        await breaker.record_failure()
+        self.assertEqual(breaker.state, "closed")
+
+    async def test_open_blocks_until_cooldown(self):
+        breaker = CircuitBreaker(2, COOLDOWN)
+        await self.trip(breaker)
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(await admitted(breaker, COOLDOWN / 2))
+        self.assertTrue(await admitted(breaker))
+        self.assertEqual(breaker.state, "half_open")
+
+    async def test_half_open_admits_a_single_probe(self):
+        breaker = CircuitBreaker(1, COOLDOWN)
+        await self.trip(breaker)
+        self.assertTrue(await admitted(breaker))
+        self.assertFalse(await admitted(breaker, COOLDOWN))
+
+    async def test_probe_success_closes_and_admits_everyone(self):
+        breaker = CircuitBreaker(1, COOLDOWN)
+        await self.trip(breaker)
+        await breaker.admit()
+        waiter = asyncio.ensure_future(breaker.admit())
+        await breaker.record_success()
+        await asyncio.wait_for(waiter, 0.2)
+        self.assertEqual(breaker.state, "closed")
+
+    async def test_probe_failure_reopens_with_longer_cooldown(self):
+        breaker = CircuitBreaker(1, COOLDOWN)
+        await self.trip(breaker)
+        await breaker.admit()
+        await breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        # The second trip waits twice the cooldown.
+        self.assertFalse(await admitted(breaker, COOLDOWN * 1.5))
+        self.assertTrue(await admitted(breaker))
+
+    async def test_released_probe_lets_the_next_caller_probe(self):
+        breaker = CircuitBreaker(1, COOLDOWN)
+        await self.trip(breaker)
+        await breaker.admit()
+        waiter = asyncio.ensure_future(breaker.admit())
+        await asyncio.sleep(0)
+        self.assertFalse(waiter.done())
+        # e.g. the probe timed out or got a 404: not a server failure.
+        breaker.release_probe()
+        await asyncio.wait_for(waiter, 0.2)
+        self.assertEqual(breaker.state, "half_open")
+        self.assertFalse(await admitted(breaker, COOLDOWN))
+
+    async def test_release_probe_is_a_no_op_when_closed(self):
+        breaker = CircuitBreaker(1, COOLDOWN)
+        breaker.release_probe()
+        self.assertEqual(breaker.state, "closed")
+        self.assertTrue(await admitted(breaker, 0.01))
+
+
+class AsyncRateLimiterTests(unittest.IsolatedAsyncioTestCase):
+    async def test_burst_then_refill_rate(self):
+        limiter = AsyncRateLimiter(10, 0.5)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for _ in range(10):
+            await limiter.acquire()
+        self.assertLess(loop.time() - start, 0.05)
+        for _ in range(5):
+            await limiter.acquire()
+        # Five more tokens at 20 per second take about a quarter second.
+        self.assertGreaterEqual(loop.time() - start, 0.2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+import asyncio
+import unittest
+import unittest.mock
+import warnings
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", FutureWarning)
+    from core import summarizer as summarizer_module
+    from core.summarizer import GeminiSummarizer
+
+
+def bare_summarizer() -> GeminiSummarizer:
+    """A summarizer without a Gemini client; tests stub the calls they need."""
+    summarizer = GeminiSummarizer.__new__(GeminiSummarizer)
+    summarizer._inflight = {}
+    summarizer._batch_pending = []
+    summarizer._historical_active = 0
+    summarizer._batch_timer = None
+    summarizer._batch_tasks = set()
+    summarizer._cache_locks = {}
+    summarizer._cache_lock_users = {}
+    return summarizer
+
+
+class InflightDedupTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.summarizer = bare_summarizer()
+        self.calls = 0
+
+        async def fake_summarize(*args):
+            self.calls += 1
+            await asyncio.sleep(0.01)
+            return {"executive_summary": "Flat quarter.", "key_financials": ["Rev +2%"]}
+
+        self.summarizer._summarize = fake_summarize
+
+    def summarize(self, pdf_url="https://example.com/a.pdf"):
+        return self.summarizer.summarize(
+            {"text": "transcript"}, "Acme Ltd", pdf_url
+        )
+
+    async def test_identical_calls_share_one_request(self):
+        results = await asyncio.gather(self.summarize(), self.summarize())
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(self.summarizer._inflight, {})
+
+    async def test_different_calls_do_not_share(self):
+        await asyncio.gather(
+            self.summarize(), self.summarize("https://example.com/b.pdf")
+        )
+        self.assertEqual(self.calls, 2)
+
+    async def test_every_caller_gets_its_own_copy(self):
+        async def summarize_and_annotate():
+            # Like the scraper, mutate the result as soon as it arrives,
+            # before the other caller has resumed.
+            summary = await self.summarize()
+            summary.update({"comparison_with_previous_call": "Better."})
+            summary["key_financials"].append("EBITDA +5%")
+            return summary
+
+        _, second = await asyncio.gather(summarize_and_annotate(), self.summarize())
+        self.assertNotIn("comparison_with_previous_call", second)
+        self.assertEqual(second["key_financials"], ["Rev +2%"])
+
+    async def test_cancelled_caller_does_not_cancel_the_shared_call(self):
+        first = asyncio.ensure_future(self.summarize())
+        second = asyncio.ensure_future(self.summarize())
+        await asyncio.sleep(0)
+        first.cancel()
+        result = await second
+        self.assertEqual(result["executive_summary"], "Flat quarter.")
+
+
+class CachedSummaryTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.summarizer = bare_summarizer()
+        self.summarizer._read_cache = lambda key: None
+        self.summarizer._write_cache = lambda key, summary: None
+        self.active = 0
+        self.most_active = 0
+        self.calls = 0
+
+    async def failing_call(self):
+        self.calls += 1
+        self.active += 1
+        self.most_active = max(self.most_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return None  # a failed call, which is never cached
+
+    async def test_calls_for_one_key_never_overlap(self):
+        first = asyncio.ensure_future(
+            self.summarizer._cached_summary("k", self.failing_call)
+        )
+        second = asyncio.ensure_future(
+            self.summarizer._cached_summary("k", self.failing_call)
+        )
+        await first
+        # The second caller now holds the lock; a third must queue behind it.
+        third = await self.summarizer._cached_summary("k", self.failing_call)
+        await second
+        self.assertIsNone(third)
+        self.assertEqual(self.calls, 3)
+        self.assertEqual(self.most_active, 1)
+
+    async def test_lock_is_dropped_when_unused(self):
+        await asyncio.gather(
+            *(self.summarizer._cached_summary("k", self.failing_call) for _ in range(3))
+        )
+        self.assertEqual(self.summarizer._cache_locks, {})
+        self.assertEqual(self.summarizer._cache_lock_users, {})
+
+
+class HistoricalBatchTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.summarizer = bare_summarizer()
+        self.batches = []
+
+        async def fake_summarize_batch(items):
+            self.batches.append([company_name for _, company_name in items])
+            return [{"company_name": company_name} for _, company_name in items]
+
+        self.summarizer.summarize_batch = fake_summarize_batch
+
+    async def request(self, company_name):
+        # summarize() counts each historical text request while it runs.
+        self.summarizer._historical_active += 1
+        try:
+            return await self.summarizer._batched_historical_summary(
+                {"type": "text", "content": company_name}, company_name
+            )
+        finally:
+            self.summarizer._historical_active -= 1
+
+    async def test_lone_request_is_not_held_back(self):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        self.assertIsNone(await self.request("Acme Ltd"))
+        self.assertLess(loop.time() - start, 0.05)
+        self.assertIsNone(self.summarizer._batch_timer)
+        self.assertEqual(self.batches, [])
+
+    async def test_requests_behind_a_running_one_are_batched(self):
+        self.summarizer._historical_active = 1  # one already under way
+        with unittest.mock.patch.object(
+            summarizer_module, "HISTORICAL_BATCH_WAIT_SECONDS", 0.01
+        ):
+            results = await asyncio.gather(
+                self.request("A"), self.request("B"), self.request("C")
+            )
+        self.assertEqual(self.batches, [["A", "B", "C"]])
+        self.assertEqual([r["company_name"] for r in results], ["A", "B", "C"])
+
+    async def test_full_batch_is_sent_without_waiting(self):
+        self.summarizer._historical_active = 1
+        size = summarizer_module.HISTORICAL_BATCH_SIZE
+        names = [f"Co {n}" for n in range(size)]
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(*(self.request(name) for name in names))
+        self.assertLess(loop.time() - start, 0.1)
+        self.assertEqual(self.batches, [names])
+
+
+if __name__ == "__main__":
+    unittest.main()